@@ -1,3 +1,4 @@
+from bisect import bisect_left
 from typing import List, Dict, Tuple
 
 
@@ -9,8 +10,14 @@ def find_atm_strike(underlying_price: float, options: List[Dict]) -> float:
     # Get unique strikes
     strikes = sorted(set(opt["strike"] for opt in options))
     
-    # Find closest strike to underlying price
-    atm_strike = min(strikes, key=lambda x: abs(x - underlying_price))
+    # Closest strike to underlying price: one of the two strikes around its
+    # insertion point (the lower one on a tie)
+    index = bisect_left(strikes, underlying_price)
+    if index == len(strikes) or (
+        index > 0 and underlying_price - strikes[index - 1] <= strikes[index] - underlying_price
+    ):
+        index -= 1
+    atm_strike = strikes[index]
     
     return atm_strike
 
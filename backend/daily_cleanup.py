@@ -61,6 +61,7 @@ async def reset_in_memory_state():
             try:
                 # Use the comprehensive reset_for_new_day method
                 pipeline.state.reset_for_new_day()
+                pipeline.publish()
                 print("✅ Reset in-memory state (baseline_greeks, price_history, latest_data, signal_state)")
             finally:
                 pipeline.release_lock()
@@ -11,6 +11,7 @@ from volatility_model import calculate_volatility_metrics
 from direction_model import calculate_direction_metrics
 import json
 import urllib.parse
+import numpy as np
 
 
 def get_tuesday_expiry() -> str:
@@ -380,8 +381,10 @@ def normalize_option_chain(upstox_data: Dict) -> Dict:
         # Use expiry_date from fetch (stored in _expiry_date) or calculate it
         expiry_date = upstox_data.get("_expiry_date") or get_tuesday_expiry()
         
+        now_utc = datetime.now(timezone.utc)
         return {
-            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "timestamp": now_utc.isoformat(),
+            "timestamp_dt": now_utc,  # same instant as a datetime, so callers don't re-parse it
             "underlying_price": underlying_price,
             "atm_strike": atm_strike,
             "expiry_date": expiry_date,
@@ -1001,7 +1004,8 @@ async def polling_worker():
                         options=normalized_data["options"],
                         atm_strike=normalized_data["atm_strike"],
                         underlying_price=current_price,
-                        full_day_price_history=full_day_price_history,
+                        full_day_timestamps=np.array([p["timestamp"].timestamp() for p in full_day_price_history], dtype=np.float64),
+                        full_day_prices=np.array([p["price"] for p in full_day_price_history], dtype=np.float64),
                         rv_ratio_prev=rv_ratio_prev,
                         prev_volatility_metrics=prev_volatility_data,
                         rv_ratio_contraction_threshold=settings.get("vol_rv_ratio_contraction_threshold", 0.8),
@@ -1069,7 +1073,7 @@ async def polling_worker():
                         # Import here to avoid circular dependency
                         from database import log_market_data
                         # Log the data to the database for ML training
-                        await log_market_data(latest_data)
+                        log_market_data(latest_data)
                 except Exception as e:
                     print(f"⚠️  Error processing data: {e}")
                     import traceback
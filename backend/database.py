@@ -1,5 +1,8 @@
 import json
 import asyncio
+import logging
+import time
+from collections import deque
 from datetime import datetime
 from typing import Optional, Dict, List
 import os
@@ -7,12 +10,14 @@ try:
     import motor.motor_asyncio
     from pymongo import MongoClient
     from pymongo.server_api import ServerApi
-    from pymongo.errors import ConnectionFailure
+    from pymongo.errors import BulkWriteError, ConnectionFailure
     import certifi
 except ImportError:
     print("motor/pymongo not found. Please install with 'pip install motor pymongo'.")
     exit(1)
 
+logger = logging.getLogger(__name__)
+
 MONGO_URI = os.getenv("MONGO_URI")
 
 # Only use SSL/TLS for MongoDB Atlas (cloud) connections, not for local MongoDB
@@ -91,7 +96,11 @@ async def init_db():
         )
 
 async def store_tokens(username: str, access_token: str, refresh_token: str, expires_at: int):
-    """Store or update OAuth tokens for a user."""
+    """
+    Store or update OAuth tokens for a user.
+    updated_at is written as a naive UTC datetime (a BSON date) and comes back
+    from Mongo the same way; readers shift it to IST to check the trading day.
+    """
     await users_collection.update_one(
         {"username": username},
         {
@@ -178,6 +187,22 @@ async def get_user_settings(username: str) -> Optional[Dict]:
     settings_doc = await settings_collection.find_one({"username": username})
     return settings_doc
 
+# Settings change rarely, so the polling loop reads them through a short-lived
+# cache. update_user_settings drops the entry on every write in this process;
+# writes from other workers show up once the TTL expires.
+SETTINGS_CACHE_TTL = 60  # seconds
+_settings_cache: Dict[str, tuple] = {}
+
+async def get_cached_user_settings(username: str, ttl: float = SETTINGS_CACHE_TTL) -> Optional[Dict]:
+    """Get user settings, reusing a copy fetched within the last `ttl` seconds. Treat the result as read-only."""
+    cached = _settings_cache.get(username)
+    now = time.monotonic()
+    if cached is not None and now - cached[0] < ttl:
+        return cached[1]
+    settings_doc = await get_user_settings(username)
+    _settings_cache[username] = (now, settings_doc)
+    return settings_doc
+
 async def update_user_settings(username: str, settings: Dict) -> Optional[Dict]:
     """Update user settings."""
     # Fields that should be updated (excluding prev_day fields which are handled separately)
@@ -215,10 +240,20 @@ async def update_user_settings(username: str, settings: Dict) -> Optional[Dict]:
         {"$set": update_data},
         return_document=True
     )
+    _settings_cache.pop(username, None)
     return result
 
-async def log_market_data(data: dict):
-    """Logs a snapshot of market data to the database for ML training."""
+# Market data snapshots are buffered in memory and written with insert_many
+# by market_data_log_flusher(), instead of one insert_one per poll.
+MARKET_DATA_LOG_FLUSH_INTERVAL = 15  # seconds
+MARKET_DATA_LOG_BATCH_SIZE = 32  # flush early once this many snapshots are waiting
+_market_data_log_buffer: deque = deque(maxlen=1000)
+_market_data_log_batch_ready = asyncio.Event()
+# insert_many error code for a snapshot that is already stored (re-sent after a partial write)
+DUPLICATE_KEY_ERROR = 11000
+
+def log_market_data(data: dict):
+    """Queues a snapshot of market data for the next batched write (for ML training)."""
     if not data or 'timestamp' not in data:
         return
 
@@ -235,7 +270,50 @@ async def log_market_data(data: dict):
         "direction_metrics": data.get("direction_metrics", {}),
         "option_count": data.get("option_count", 0)
     }
-    await market_data_log_collection.insert_one(log_entry)
+    _market_data_log_buffer.append(log_entry)
+    if len(_market_data_log_buffer) >= MARKET_DATA_LOG_BATCH_SIZE:
+        _market_data_log_batch_ready.set()
+
+async def flush_market_data_log() -> int:
+    """
+    Writes all buffered market data snapshots in one insert_many. Returns count written.
+    On failure the unwritten snapshots go back to the front of the buffer (still
+    capped by its maxlen) for the next flush, and the error is re-raised.
+    """
+    if not _market_data_log_buffer:
+        return 0
+    batch = list(_market_data_log_buffer)
+    _market_data_log_buffer.clear()
+    try:
+        await market_data_log_collection.insert_many(batch, ordered=False)
+    except BulkWriteError as e:
+        # Unordered insert: everything except the reported failures was written
+        failed = [
+            batch[err["index"]] for err in e.details.get("writeErrors", [])
+            if err.get("code") != DUPLICATE_KEY_ERROR
+        ]
+        _market_data_log_buffer.extendleft(reversed(failed))
+        raise
+    except Exception:
+        _market_data_log_buffer.extendleft(reversed(batch))
+        raise
+    return len(batch)
+
+async def market_data_log_flusher(interval: float = MARKET_DATA_LOG_FLUSH_INTERVAL):
+    """
+    Background task that flushes buffered market data snapshots every `interval`
+    seconds, or as soon as MARKET_DATA_LOG_BATCH_SIZE of them are waiting.
+    """
+    while True:
+        try:
+            await asyncio.wait_for(_market_data_log_batch_ready.wait(), timeout=interval)
+        except asyncio.TimeoutError:
+            pass
+        _market_data_log_batch_ready.clear()
+        try:
+            await flush_market_data_log()
+        except Exception as e:
+            logger.warning("⚠️ Market data log flush error: %s", e)
 
 async def log_signal(username: str, position: str, strike_price: float, strike_ltp: float,
                delta: float, vega: float, theta: float, gamma: float, raw_chain: dict):
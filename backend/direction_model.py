@@ -11,9 +11,12 @@ And derives a daily directional state:
 - DIRECTIONAL_BEAR
 - NEUTRAL
 """
-from typing import Dict, List, Optional, Tuple
+import math
+from typing import Dict, List, Optional, Tuple, Union
 from datetime import datetime, timedelta, timezone
 
+import numpy as np
+
 
 def calculate_gap_and_acceptance(
     open_price: Optional[float],
@@ -322,9 +325,10 @@ def calculate_rea(
 
 
 def calculate_delta_efficiency(
-    intraday_prices: List[Dict],
+    intraday_prices: Union[List[Dict], np.ndarray],
     open_price: Optional[float],
     close_price: Optional[float],
+    path_length: Optional[float] = None,
 ) -> Optional[float]:
     """
     Delta Efficiency (DE)
@@ -332,17 +336,21 @@ def calculate_delta_efficiency(
     r_i = Price_i - Price_{i-1}
 
     DE = |Close - Open| / Σ |r_i|
+
+    intraday_prices is either the time-ordered price dicts or a float64 array of the prices.
+    path_length, when given, is Σ |r_i| already accumulated by the caller and is used as is.
     """
     if open_price is None or close_price is None or len(intraday_prices) < 2:
         return None
 
-    # Ensure prices in time order
-    prices = [p["price"] for p in intraday_prices]
-    denom = 0.0
-    prev = prices[0]
-    for price in prices[1:]:
-        denom += abs(price - prev)
-        prev = price
+    if path_length is not None:
+        denom = path_length
+    else:
+        if isinstance(intraday_prices, np.ndarray):
+            prices = intraday_prices
+        else:
+            prices = np.fromiter((p["price"] for p in intraday_prices), dtype=np.float64, count=len(intraday_prices))
+        denom = math.fsum(np.abs(np.diff(prices)))
 
     if denom <= 0:
         return None
@@ -404,12 +412,17 @@ def calculate_direction_metrics(
     current_time: Optional[datetime] = None,
     settings: Optional[Dict] = None,
     open_price: Optional[float] = None,
+    price_path_length: Optional[float] = None,
 ) -> Dict:
     """
     High-level entry point to compute all Direction & Asymmetry metrics.
 
     NOTE: This relies only on intraday price history for the current day.
     Previous-day stats can be added later if available.
+
+    price_path_length, when given, is Σ |Δprice| over price_history kept
+    incrementally by the caller (the pipeline's PriceSeries), so Delta
+    Efficiency does not rescan the day.
     """
     if not price_history or market_open_time is None:
         return {
@@ -514,6 +527,7 @@ def calculate_direction_metrics(
         intraday_prices=intraday_prices,
         open_price=open_price,
         close_price=close_price,
+        path_length=price_path_length,
     )
 
     directional_state, directional_info = determine_directional_state(
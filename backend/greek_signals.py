@@ -1,5 +1,5 @@
 from typing import Dict, List, Tuple, Optional
-from database import get_user_settings, log_signal
+from database import get_cached_user_settings, log_signal
 from utils import aggregate_greeks_atm_otm
 
 # Greek signature patterns for each position
@@ -78,7 +78,7 @@ async def detect_signals(normalized_data: Dict, aggregated_greeks: Dict, usernam
     Returns list of signal detection results for all positions
     """
     # Get user settings
-    settings = await get_user_settings(username)
+    settings = await get_cached_user_settings(username)
     if not settings:
         # Use defaults
         settings = {
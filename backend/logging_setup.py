@@ -0,0 +1,38 @@
+"""
+Non-blocking logging setup.
+
+Log calls only put the record on a queue; a QueueListener thread does the
+actual stdout writes, so the event loop never waits on console I/O.
+"""
+import atexit
+import logging
+import logging.handlers
+import queue
+import sys
+
+_listener = None
+
+# Third-party loggers that are chatty at INFO (httpx logs every request, i.e.
+# several lines per poll); only their warnings and errors are kept
+QUIET_LOGGERS = ("httpx", "httpcore")
+
+
+def setup_logging(level: int = logging.INFO):
+    """Route the root logger through a queue drained by a background thread. Safe to call twice."""
+    global _listener
+    if _listener is not None:
+        return
+
+    log_queue = queue.SimpleQueue()
+    console = logging.StreamHandler(sys.stdout)
+    console.setFormatter(logging.Formatter("%(message)s"))
+
+    _listener = logging.handlers.QueueListener(log_queue, console, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_listener.stop)
+
+    root = logging.getLogger()
+    root.addHandler(logging.handlers.QueueHandler(log_queue))
+    root.setLevel(level)
+    for name in QUIET_LOGGERS:
+        logging.getLogger(name).setLevel(max(level, logging.WARNING))
@@ -6,22 +6,32 @@ import uvicorn
 from contextlib import asynccontextmanager
 import asyncio
 from typing import Dict, List
-import json
+import orjson
 from datetime import datetime, timezone
 from dotenv import load_dotenv
 
 # Load environment variables from .env file
 load_dotenv() 
 
+import logging
+from logging_setup import setup_logging
+
+setup_logging()
+logger = logging.getLogger(__name__)
+
 from auth import auth_router, get_frontend_user_from_token_async
-from database import init_db, get_user_settings, update_user_settings
+from database import (
+    init_db, get_user_settings, update_user_settings,
+    market_data_log_flusher, flush_market_data_log
+)
 from ws_manager import manager # Import the shared manager instance
 from pipeline_worker import (
-    start_polling, stop_polling, get_latest_data, 
+    start_polling, stop_polling, get_broadcast_payload,
     get_current_user as get_current_authenticated_user,
     reset_baseline as clear_daily_baseline_async, pipeline
 )
 from greek_signals import detect_signals
+from server_config import WS_CONFIG
 
 # For data export
 from fastapi.responses import StreamingResponse
@@ -30,52 +40,64 @@ import io
 
 import os
 
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+BACKGROUND_TASKS_LOCK = "/tmp/background_tasks.lock"
+
+# Descriptor holding the flock on BACKGROUND_TASKS_LOCK in the main worker.
+# Kept open for the life of the process; the kernel drops the lock when the
+# process exits for any reason (including SIGKILL/OOM), so it is never stale.
+_main_worker_lock_fd = None
+
+
+def _release_main_worker_lock():
+    """Release the background-task lock if this process holds it"""
+    global _main_worker_lock_fd
+    if _main_worker_lock_fd is not None:
+        try:
+            os.close(_main_worker_lock_fd)
+        except OSError:
+            pass
+        _main_worker_lock_fd = None
+
+
 def _is_main_worker():
     """Check if this is the main worker process (first worker)"""
-    # Use a file-based lock to ensure only one worker starts background tasks
-    # This works across multiple gunicorn workers
-    lock_file = "/tmp/background_tasks.lock"
+    # An exclusive flock on a shared file elects exactly one process across all
+    # gunicorn workers. The file itself is never removed: unlinking it would let
+    # another worker lock a fresh inode while the old lock is still held.
+    global _main_worker_lock_fd
+    if _main_worker_lock_fd is not None:
+        return True
+    if fcntl is None:
+        # No flock (Windows): only the single-process dev server runs there
+        return True
     
     try:
-        import fcntl
-        
-        # Clean up stale lock file on new deployment (check if PID in file is still running)
-        if os.path.exists(lock_file):
-            try:
-                with open(lock_file, 'r') as f:
-                    old_pid = int(f.read().strip())
-                # Check if old process is still running
-                try:
-                    os.kill(old_pid, 0)  # Signal 0 just checks if process exists
-                except OSError:
-                    # Process doesn't exist, remove stale lock
-                    os.remove(lock_file)
-            except (ValueError, IOError, OSError):
-                # Can't read PID or file issue, try to remove
-                try:
-                    os.remove(lock_file)
-                except OSError:
-                    pass
-        
-        # Try to acquire an exclusive lock (non-blocking)
-        lock_fd = os.open(lock_file, os.O_CREAT | os.O_WRONLY)
-        try:
-            fcntl.flock(lock_fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
-            # We got the lock, write our PID and mark as main worker
-            os.write(lock_fd, str(os.getpid()).encode())
-            os.fsync(lock_fd)
-            return True
-        except (IOError, OSError):
-            # Lock is held by another process
-            os.close(lock_fd)
-            return False
-    except (ImportError, OSError):
-        # fcntl not available (Windows) or file operations failed
-        # Fallback: check environment variable set by first worker
-        if os.getenv("BACKGROUND_TASKS_STARTED") == "1":
-            return False
-        os.environ["BACKGROUND_TASKS_STARTED"] = "1"
+        lock_fd = os.open(BACKGROUND_TASKS_LOCK, os.O_CREAT | os.O_WRONLY, 0o600)
+    except OSError as e:
+        # Lock file can't be opened at all (e.g. read-only /tmp); assume single worker
+        logger.warning("⚠️ Could not open background task lock (%s), assuming main worker", e)
         return True
+    
+    try:
+        fcntl.flock(lock_fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        # Lock is held by another worker
+        os.close(lock_fd)
+        return False
+    
+    # We got the lock; record our PID for anyone inspecting the file
+    try:
+        os.ftruncate(lock_fd, 0)
+        os.write(lock_fd, str(os.getpid()).encode())
+    except OSError:
+        pass
+    _main_worker_lock_fd = lock_fd
+    return True
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
@@ -86,12 +108,15 @@ async def lifespan(app: FastAPI):
     is_main = _is_main_worker()
     
     if is_main:
-        print("Database initialized")
-        print("Backend server ready. Polling will start automatically when a user authenticates.")
+        logger.info("Database initialized")
+        logger.info("Backend server ready. Polling will start automatically when a user authenticates.")
         
         # Start background polling task (will wait for authentication)
         polling_task = asyncio.create_task(start_polling()) # The worker will use the global manager
         
+        # Start batched writer for the market data log
+        log_flush_task = asyncio.create_task(market_data_log_flusher())
+        
         # Start automated token refresh scheduler (runs daily at 9:15 AM IST)
         from auto_auth import daily_token_refresh_scheduler
         token_refresh_task = asyncio.create_task(daily_token_refresh_scheduler())
@@ -106,16 +131,20 @@ async def lifespan(app: FastAPI):
             from data_logger import run_logger
             data_logger_task = asyncio.create_task(run_logger())
         except Exception as e:
-            print(f"⚠️ Data logger failed to start: {e}")
+            logger.warning("⚠️ Data logger failed to start: %s", e)
             data_logger_task = None
     else:
         # This is a duplicate worker, just initialize DB
-        print("Database initialized (worker process)")
+        logger.info("Database initialized (worker process)")
         polling_task = None
+        log_flush_task = None
         token_refresh_task = None
         token_cleanup_task = None
         data_logger_task = None
     
+    # Every worker relays broadcasts from Redis when it is configured
+    fanout_task = asyncio.create_task(manager.run_redis_fanout()) if manager.redis_enabled else None
+    
     yield
     
     # Shutdown
@@ -126,6 +155,10 @@ async def lifespan(app: FastAPI):
         polling_task.cancel()
         tasks_to_cancel.append(polling_task)
     
+    if log_flush_task is not None:
+        log_flush_task.cancel()
+        tasks_to_cancel.append(log_flush_task)
+    
     if token_refresh_task is not None:
         token_refresh_task.cancel()
         tasks_to_cancel.append(token_refresh_task)
@@ -138,11 +171,25 @@ async def lifespan(app: FastAPI):
         data_logger_task.cancel()
         tasks_to_cancel.append(data_logger_task)
     
+    if fanout_task is not None:
+        fanout_task.cancel()
+        tasks_to_cancel.append(fanout_task)
+    
     for task in tasks_to_cancel:
         try:
             await task
         except asyncio.CancelledError:
             pass
+    
+    await manager.close()
+    
+    if is_main:
+        # Write whatever the market data log buffer still holds
+        try:
+            await flush_market_data_log()
+        except Exception as e:
+            logger.warning("⚠️ Final market data log flush failed: %s", e)
+        _release_main_worker_lock()
 
 
 app = FastAPI(lifespan=lifespan)
@@ -160,47 +207,50 @@ app.add_middleware(
 app.include_router(auth_router, prefix="/api/auth", tags=["auth"])
 
 
+PONG_MESSAGE = orjson.dumps({"type": "pong"}).decode()
+# Exactly what the dashboard's JSON.stringify({ type: 'ping' }) sends
+PING_MESSAGE = '{"type":"ping"}'
+
+
 @app.websocket("/ws")
 async def websocket_endpoint(websocket: WebSocket):
     try:
-        await manager.connect(websocket)
+        if not await manager.connect(websocket):
+            return  # Rejected (connection limit); the socket is already closed
         
-        # Send initial data on connection
-        latest_data = get_latest_data()
-        if latest_data:
-            try:
-                await websocket.send_json(latest_data)
-            except:
-                # Connection closed immediately, exit
-                manager.disconnect(websocket)
-                return
+        # Send initial data on connection, reusing the last broadcast frame when it is current.
+        # Workers that don't poll fall back to the last frame relayed over Redis.
+        broadcast_payload = get_broadcast_payload()
+        initial_message = manager.serialize(broadcast_payload) if broadcast_payload else manager.last_relayed_message
+        if initial_message:
+            manager.send(websocket, initial_message)
         
-        # Keep connection alive
+        # Keep connection alive. Liveness of the socket itself is handled by
+        # protocol-level PING/PONG frames (see ws_ping_interval in server_config.WS_CONFIG);
+        # we only answer the dashboard's own heartbeat messages here.
         while True:
             try:
-                message = await asyncio.wait_for(websocket.receive_text(), timeout=60.0)
+                message = await websocket.receive_text()
+                manager.update_ping(websocket)  # Any client message counts as a heartbeat
                 
-                # Handle ping messages
+                # Handle ping messages; the dashboard's heartbeat is matched as-is
+                # and only other messages go through the JSON parser
+                if message == PING_MESSAGE:
+                    manager.send(websocket, PONG_MESSAGE)
+                    continue
                 try:
-                    data = json.loads(message)
+                    data = orjson.loads(message)
                     if data.get("type") == "ping":
-                        manager.update_ping(websocket)  # Update ping timestamp
-                        await websocket.send_json({"type": "pong"})
+                        manager.send(websocket, PONG_MESSAGE)
                 except:
                     pass
                     
-            except asyncio.TimeoutError:
-                # Send ping to keep alive
-                try:
-                    await websocket.send_json({"type": "ping"})
-                except (WebSocketDisconnect, RuntimeError):
-                    break
             except WebSocketDisconnect:
                 break
     except WebSocketDisconnect:
         pass  # Normal disconnection
     except Exception as e:
-        print(f"❌ WebSocket error: {e}")
+        logger.error("❌ WebSocket error: %s", e, exc_info=True)
     finally:
         try:
             manager.disconnect(websocket)
@@ -233,6 +283,31 @@ async def reset_baseline():
     return {"message": "Baseline greeks for today have been cleared. A new baseline will be captured on the next data poll."}
 
 
+# Returned for users who haven't saved settings yet
+DEFAULT_SETTINGS = {
+    "delta_threshold": 0.20,
+    "vega_threshold": 0.10,
+    "theta_threshold": 0.02,
+    "gamma_threshold": 0.01,
+    "consecutive_confirmations": 2,
+    "vol_rv_ratio_contraction_threshold": 0.7,
+    "vol_rv_ratio_expansion_threshold": 1.3,
+    "vol_min_rv_ratio_acceleration": 0.05,
+    # Direction & Asymmetry thresholds
+    "dir_gap_acceptance_threshold": 0.55,
+    "dir_acceptance_neutral_threshold": 0.5,
+    "dir_rea_bull_threshold": 0.20,
+    "dir_rea_bear_threshold": -0.20,
+    "dir_rea_neutral_abs_threshold": 0.20,
+    "dir_de_directional_threshold": 0.35,
+    "dir_de_neutral_threshold": 0.3,
+    # Optional previous-day inputs (for Opening Location & Gap Acceptance)
+    "prev_day_close": None,
+    "prev_day_range": None,
+    "prev_day_date": None,  # ISO date string of the provided previous-day stats
+}
+
+
 @app.get("/api/settings/{user}")
 async def get_settings(user: str):
     """Get user settings"""
@@ -240,28 +315,7 @@ async def get_settings(user: str):
     # If no settings are found for the user, return a default structure.
     # This prevents a 500 error for new users who haven't saved settings yet.
     if not settings:
-        return {
-            "delta_threshold": 0.20,
-            "vega_threshold": 0.10,
-            "theta_threshold": 0.02,
-            "gamma_threshold": 0.01,
-            "consecutive_confirmations": 2,
-            "vol_rv_ratio_contraction_threshold": 0.7,
-            "vol_rv_ratio_expansion_threshold": 1.3,
-            "vol_min_rv_ratio_acceleration": 0.05,
-            # Direction & Asymmetry thresholds
-            "dir_gap_acceptance_threshold": 0.55,
-            "dir_acceptance_neutral_threshold": 0.5,
-            "dir_rea_bull_threshold": 0.20,
-            "dir_rea_bear_threshold": -0.20,
-            "dir_rea_neutral_abs_threshold": 0.20,
-            "dir_de_directional_threshold": 0.35,
-            "dir_de_neutral_threshold": 0.3,
-            # Optional previous-day inputs (for Opening Location & Gap Acceptance)
-            "prev_day_close": None,
-            "prev_day_range": None,
-            "prev_day_date": None,  # ISO date string of the provided previous-day stats
-        }
+        return dict(DEFAULT_SETTINGS)
     
     # Convert ObjectId to string to avoid JSON serialization error
     if "_id" in settings:
@@ -311,33 +365,45 @@ async def health_check(request: Request):
     return response_data
 
 
+EXPORT_HEADERS = ["timestamp", "underlying_price", "atm_strike", "aggregated_greeks", "signals"]
+EXPORT_BATCH_ROWS = 500
+
+
 @app.get("/api/export-data")
 async def export_data():
     """Exports the collected market data log as a CSV file."""
     from database import market_data_log_collection
     import csv
 
-    output = io.StringIO()
-    writer = csv.writer(output)
-
-    # Write headers
-    headers = ["timestamp", "underlying_price", "atm_strike", "aggregated_greeks", "signals"]
-    writer.writerow(headers)
-
-    # Fetch data from MongoDB
-    cursor = market_data_log_collection.find({}, {"_id": 0}).sort("timestamp", 1)
-    async for doc in cursor:
-        writer.writerow([
-            doc.get("timestamp"),
-            doc.get("underlying_price"),
-            doc.get("atm_strike"),
-            json.dumps(doc.get("aggregated_greeks")),
-            json.dumps(doc.get("signals"))
-        ])
-
-    # Seek to the beginning of the stream
-    output.seek(0)
-    return StreamingResponse(output, media_type="text/csv", headers={"Content-Disposition": "attachment; filename=market_data_log.csv"})
+    # Only decode the exported fields; the logged snapshots also carry the
+    # (much larger) baseline, volatility and direction sub-documents
+    projection = {"_id": 0, **{field: 1 for field in EXPORT_HEADERS}}
+
+    async def generate_rows():
+        output = io.StringIO()
+        writer = csv.writer(output)
+        writer.writerow(EXPORT_HEADERS)
+
+        cursor = market_data_log_collection.find({}, projection).sort("timestamp", 1).batch_size(EXPORT_BATCH_ROWS)
+        rows = 0
+        async for doc in cursor:
+            writer.writerow([
+                doc.get("timestamp"),
+                doc.get("underlying_price"),
+                doc.get("atm_strike"),
+                orjson.dumps(doc.get("aggregated_greeks")).decode(),
+                orjson.dumps(doc.get("signals")).decode()
+            ])
+            rows += 1
+            # Stream in chunks instead of holding the whole export in memory
+            if rows % EXPORT_BATCH_ROWS == 0:
+                yield output.getvalue()
+                output.seek(0)
+                output.truncate(0)
+
+        yield output.getvalue()
+
+    return StreamingResponse(generate_rows(), media_type="text/csv", headers={"Content-Disposition": "attachment; filename=market_data_log.csv"})
 
 
 @app.delete("/api/clear-data")
@@ -453,7 +519,10 @@ async def root():
 
 # Mount the 'assets' directory from within 'static' to serve JS, CSS, etc.
 # This path must match the base path in your frontend build config (Vite)
-app.mount("/assets", StaticFiles(directory="static/assets"), name="assets")
+# Behind a reverse proxy/CDN that serves /assets itself (see md_files/SETUP.md),
+# set SERVE_STATIC_ASSETS=0 to keep asset file I/O off the event loop.
+if os.getenv("SERVE_STATIC_ASSETS", "1") != "0":
+    app.mount("/assets", StaticFiles(directory="static/assets"), name="assets")
 
 # The catch-all route to handle client-side routing (e.g., /dashboard, /settings)
 # This must be the LAST route defined.
@@ -472,4 +541,12 @@ if __name__ == "__main__":
     print("NOTE: No browser will open automatically!")
     print("You must manually visit: http://localhost:3000/login")
     print("="*70 + "\n")
-    uvicorn.run(app, host="0.0.0.0", port=8000, log_level="info")
+    uvicorn.run(
+        app,
+        host="0.0.0.0",
+        port=8000,
+        log_level="info",
+        # loop/http stay "auto": uvloop and httptools are used whenever they are
+        # installed (uvicorn[standard] skips uvloop on Windows)
+        **WS_CONFIG,
+    )
@@ -9,11 +9,21 @@ This module provides a clean, sequential pipeline that ensures:
 """
 
 import asyncio
+import logging
+from collections import deque
 from dataclasses import dataclass, field
-from typing import Optional, Dict, List, Any
-from datetime import datetime, timedelta, timezone
+from typing import Optional, Dict, List, Any, Tuple, Deque, Set
+from datetime import datetime, time, timedelta, timezone
 from enum import Enum
 
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+IST = timezone(timedelta(hours=5, minutes=30))
+MARKET_OPEN = time(9, 15)
+MARKET_CLOSE = time(15, 30)
+
 
 class PipelineStage(Enum):
     """Enum representing the current stage of the pipeline"""
@@ -30,18 +40,84 @@ class PipelineStage(Enum):
     COMPLETE = "complete"
 
 
-@dataclass
+@dataclass(slots=True)
 class PriceEntry:
     """A single price entry with timestamp"""
     timestamp: datetime
     price: float
 
 
-@dataclass
+class PriceSeries:
+    """
+    Append-only columnar price history.
+    
+    Timestamps (epoch seconds) and prices are kept in two float64 NumPy
+    buffers that grow by doubling, so calculators can read the whole day as
+    arrays without rebuilding a dict per entry on every poll.
+    
+    The path length Σ |price_i - price_{i-1}| is kept as a running total,
+    updated in O(1) per append with Kahan compensation, so a full day of
+    small moves doesn't accumulate rounding drift.
+    """
+    
+    def __init__(self, capacity: int = 1024):
+        self._timestamps = np.empty(capacity, dtype=np.float64)
+        self._prices = np.empty(capacity, dtype=np.float64)
+        self._size = 0
+        self._path_length = 0.0
+        self._path_compensation = 0.0
+    
+    def __len__(self) -> int:
+        return self._size
+    
+    @property
+    def path_length(self) -> float:
+        """Sum of absolute price moves between consecutive entries."""
+        return self._path_length
+    
+    def append(self, timestamp: datetime, price: float):
+        """Append one entry. Naive timestamps are treated as UTC."""
+        if timestamp.tzinfo is None:
+            timestamp = timestamp.replace(tzinfo=timezone.utc)
+        if self._size == self._timestamps.shape[0]:
+            self._grow()
+        if self._size:
+            move = abs(price - float(self._prices[self._size - 1])) - self._path_compensation
+            total = self._path_length + move
+            self._path_compensation = (total - self._path_length) - move
+            self._path_length = total
+        self._timestamps[self._size] = timestamp.timestamp()
+        self._prices[self._size] = price
+        self._size += 1
+    
+    def _grow(self):
+        capacity = self._timestamps.shape[0] * 2
+        timestamps = np.empty(capacity, dtype=np.float64)
+        prices = np.empty(capacity, dtype=np.float64)
+        timestamps[:self._size] = self._timestamps[:self._size]
+        prices[:self._size] = self._prices[:self._size]
+        self._timestamps = timestamps
+        self._prices = prices
+    
+    def clear(self):
+        """Drop all entries. Fresh buffers are used so earlier views stay intact."""
+        self.__init__(self._timestamps.shape[0])
+    
+    def arrays(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Return read-only (timestamps, prices) views over the stored entries."""
+        timestamps = self._timestamps[:self._size]
+        prices = self._prices[:self._size]
+        timestamps.flags.writeable = False
+        prices.flags.writeable = False
+        return timestamps, prices
+
+
+@dataclass(slots=True)
 class PipelineState:
     """
     Consolidated state for the entire data pipeline.
     All mutable state is contained here, protected by the pipeline lock.
+    Containers are created once and cleared in place on reset.
     """
     latest_data: Optional[Dict] = None
     raw_option_chain: Optional[Dict] = None
@@ -51,14 +127,18 @@ class PipelineState:
     should_poll: bool = False
     current_user: Optional[str] = None
     
-    price_history: List[PriceEntry] = field(default_factory=list)
-    full_day_price_history: List[PriceEntry] = field(default_factory=list)
+    price_history: Deque[PriceEntry] = field(default_factory=deque)
+    # Kept as {"timestamp", "price"} dicts, the shape the direction model reads,
+    # so the full day is never re-materialized per cycle
+    full_day_price_history: List[Dict] = field(default_factory=list)
+    full_day_series: PriceSeries = field(default_factory=PriceSeries)
     open_price: Optional[float] = None
     open_price_from_candle: Optional[float] = None
     market_open_time: Optional[datetime] = None
     
     data_sequence: int = 0
-    last_successful_poll: Optional[datetime] = None
+    last_successful_poll: Optional[datetime] = None  # wall clock, for reporting
+    last_successful_poll_monotonic: Optional[float] = None  # time.monotonic(), for stall checks
     stall_warning_sent: bool = False
     
     current_stage: PipelineStage = PipelineStage.IDLE
@@ -68,21 +148,26 @@ class PipelineState:
     
     prev_day_stats_fetched_for: Dict[str, str] = field(default_factory=dict)
     current_day_open_candle_fetched_for: Dict[str, str] = field(default_factory=dict)
+    
+    # Background DB writes started by the stages; drained by stop_polling
+    pending_writes: Set[asyncio.Task] = field(default_factory=set)
 
     def reset_for_new_day(self):
         """Reset state for a new trading day"""
-        self.price_history = []
-        self.full_day_price_history = []
+        self.price_history.clear()
+        self.full_day_price_history.clear()
+        self.full_day_series.clear()
         self.open_price = None
         self.open_price_from_candle = None
         self.market_open_time = None
         self.baseline_greeks = None
         self.data_sequence = 0
         self.last_successful_poll = None
+        self.last_successful_poll_monotonic = None
         self.stall_warning_sent = False
-        self.signal_confirmation_state = {}
-        self.prev_day_stats_fetched_for = {}
-        self.current_day_open_candle_fetched_for = {}
+        self.signal_confirmation_state.clear()
+        self.prev_day_stats_fetched_for.clear()
+        self.current_day_open_candle_fetched_for.clear()
         self.latest_data = None
         self.raw_option_chain = None
 
@@ -92,12 +177,27 @@ class PipelineState:
         self.current_user = None
         self.should_poll = False
         self.baseline_greeks = None
-        self.price_history = []
-        self.full_day_price_history = []
+        self.price_history.clear()
+        self.full_day_price_history.clear()
+        self.full_day_series.clear()
         self.open_price = None
         self.market_open_time = None
 
 
+@dataclass(frozen=True)
+class PipelineSnapshot:
+    """
+    Immutable view of the pipeline output for readers (WebSocket connects, REST endpoints).
+    The polling worker is the only writer: it builds a new snapshot and swaps the
+    reference, so readers never touch the pipeline lock.
+    """
+    latest_data: Optional[Dict] = None
+    current_user: Optional[str] = None
+    # What WebSocket clients get: latest_data with the option chain trimmed
+    # to the strikes around ATM. Same object as latest_data when not trimmed.
+    broadcast_payload: Optional[Dict] = None
+
+
 class DataPipeline:
     """
     Main pipeline orchestrator that ensures sequential processing
@@ -106,6 +206,7 @@ class DataPipeline:
     
     def __init__(self):
         self.state = PipelineState()
+        self.snapshot = PipelineSnapshot()
         self._lock = asyncio.Lock()
         self._polling_task: Optional[asyncio.Task] = None
         
@@ -118,7 +219,7 @@ class DataPipeline:
             await asyncio.wait_for(self._lock.acquire(), timeout=timeout)
             return True
         except asyncio.TimeoutError:
-            print(f"⚠️ Failed to acquire pipeline lock within {timeout}s")
+            logger.warning("⚠️ Failed to acquire pipeline lock within %ss", timeout)
             return False
     
     def release_lock(self):
@@ -126,6 +227,19 @@ class DataPipeline:
         if self._lock.locked():
             self._lock.release()
     
+    def publish(self, broadcast_payload: Optional[Dict] = None) -> PipelineSnapshot:
+        """
+        Publish latest_data and current_user from the working state as a new snapshot.
+        Must be called by the writer after changing either of them.
+        `broadcast_payload` defaults to latest_data itself.
+        """
+        self.snapshot = PipelineSnapshot(
+            latest_data=self.state.latest_data,
+            current_user=self.state.current_user,
+            broadcast_payload=broadcast_payload if broadcast_payload is not None else self.state.latest_data,
+        )
+        return self.snapshot
+    
     async def execute_stage(self, stage: PipelineStage, coro):
         """
         Execute a pipeline stage with proper state tracking.
@@ -146,8 +260,7 @@ class DataPipeline:
         else:
             current_time_utc = current_time.astimezone(timezone.utc)
 
-        ist = timezone(timedelta(hours=5, minutes=30))
-        now_ist = current_time_utc.astimezone(ist)
+        now_ist = current_time_utc.astimezone(IST)
         market_open_ist = now_ist.replace(hour=9, minute=15, second=0, microsecond=0)
         market_open_utc = market_open_ist.astimezone(timezone.utc)
         return market_open_utc
@@ -161,26 +274,28 @@ class DataPipeline:
         
         if (self.state.market_open_time is None or 
             today_market_open.date() != self.state.market_open_time.date()):
-            self.state.price_history = []
-            self.state.full_day_price_history = []
+            self.state.price_history.clear()
+            self.state.full_day_price_history.clear()
+            self.state.full_day_series.clear()
             
             if self.state.open_price_from_candle is not None:
                 self.state.open_price = self.state.open_price_from_candle
-                print(f"📊 New trading day. Using accurate open price from candle: {self.state.open_price}")
+                logger.info("📊 New trading day. Using accurate open price from candle: %s", self.state.open_price)
             else:
                 self.state.open_price = current_price
-                print(f"📊 New trading day. Open price (from spot): {self.state.open_price}")
+                logger.info("📊 New trading day. Open price (from spot): %s", self.state.open_price)
             self.state.market_open_time = today_market_open
         
         price_entry = PriceEntry(timestamp=current_time, price=current_price)
         self.state.price_history.append(price_entry)
-        self.state.full_day_price_history.append(price_entry)
+        self.state.full_day_price_history.append({"timestamp": current_time, "price": current_price})
+        self.state.full_day_series.append(current_time, current_price)
         
+        # Entries arrive in time order, so expired ones are always at the left end
         cutoff_time = current_time - timedelta(minutes=15)
-        self.state.price_history = [
-            p for p in self.state.price_history 
-            if p.timestamp >= cutoff_time
-        ]
+        price_history = self.state.price_history
+        while price_history and price_history[0].timestamp < cutoff_time:
+            price_history.popleft()
 
     def get_price_15min_ago(self, current_time: datetime) -> Optional[float]:
         """Get price from approximately 15 minutes ago."""
@@ -201,24 +316,34 @@ class DataPipeline:
 
     def is_market_hours(self) -> bool:
         """Check if current time is within market hours (09:15 - 15:30 IST)"""
-        now_utc = datetime.now(timezone.utc)
-        now_ist = now_utc + timedelta(hours=5, minutes=30)
+        now_ist = datetime.now(IST)
         
         if now_ist.weekday() >= 5:
             return False
         
-        current_time = now_ist.time()
-        start_time = datetime.strptime("09:15", "%H:%M").time()
-        end_time = datetime.strptime("15:30", "%H:%M").time()
-        
-        return start_time <= current_time <= end_time
+        return MARKET_OPEN <= now_ist.time() <= MARKET_CLOSE
+
+    def get_full_day_arrays(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Full day price history as (epoch-second timestamps, prices) arrays, without copying."""
+        return self.state.full_day_series.arrays()
+
+    def get_full_day_path_length(self) -> float:
+        """Σ |Δprice| over the full day price history, maintained incrementally."""
+        return self.state.full_day_series.path_length
 
     def get_full_day_prices_as_dicts(self) -> List[Dict]:
-        """Convert full day price history to dict format for calculations."""
-        return [
-            {"timestamp": p.timestamp, "price": p.price}
-            for p in self.state.full_day_price_history
-        ]
+        """Full day price history in dict format for calculations. Shared, not a copy: treat as read-only."""
+        return self.state.full_day_price_history
+
+    def get_rolling_window_endpoints(self) -> List[float]:
+        """
+        [first, last] price of the rolling 15-minute window, or [] with fewer than
+        two entries. RV(current) only needs these, so the window isn't copied.
+        """
+        price_history = self.state.price_history
+        if len(price_history) < 2:
+            return []
+        return [price_history[0].price, price_history[-1].price]
 
     def get_rolling_prices_as_dicts(self) -> List[Dict]:
         """Convert rolling price history to dict format for calculations."""
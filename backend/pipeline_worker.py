@@ -6,28 +6,74 @@ and calculations in a controlled, sequential manner using the pipeline architect
 """
 
 import asyncio
+import logging
+import time
 from datetime import datetime, timedelta, timezone
 from typing import Optional, Dict, List, Any
 
-from pipeline import pipeline, PipelineStage
+from pipeline import pipeline, PipelineStage, PipelineSnapshot, IST
 from ws_manager import manager
 from database import (
-    get_user_tokens, get_user_settings, update_user_settings,
-    log_market_data, db
+    get_user_tokens, get_cached_user_settings, update_user_settings,
+    log_market_data, flush_market_data_log, db
 )
+from data_fetcher import (
+    fetch_option_chain, normalize_option_chain,
+    get_daily_baseline, save_daily_baseline, calculate_change_from_baseline,
+    fetch_and_store_previous_day_data, fetch_current_day_open_candle
+)
+from utils import aggregate_greeks_atm_otm, get_option_arrays, options_near_atm
+from volatility_model import calculate_volatility_metrics
+from direction_model import calculate_direction_metrics
+from greek_signals import detect_signals
+
+logger = logging.getLogger(__name__)
+
+# Accounts checked for today's tokens, in priority order
+USERS = ("samarth", "prajwal")
+
+POLL_INTERVAL = 5.0  # seconds between option chain polls
+# Strikes on each side of ATM sent to WebSocket clients; the logged
+# snapshot keeps the whole chain
+BROADCAST_STRIKES_EACH_SIDE = 10
+IST_OFFSET = timedelta(hours=5, minutes=30)
+
+
+def _write_done(task: asyncio.Task):
+    pipeline.state.pending_writes.discard(task)
+    if not task.cancelled() and task.exception() is not None:
+        logger.warning("⚠️ Background write failed: %s", task.exception())
+
+
+def _prefetch_done(task: asyncio.Task):
+    # Retrieve a failure so a prefetch that was discarded after it finished
+    # doesn't log "Task exception was never retrieved"; when the cycle uses
+    # the prefetch it gets the same error from the await
+    if not task.cancelled():
+        task.exception()
 
 
-async def find_authenticated_user() -> Optional[str]:
+def _cancel_prefetch(prefetch: Optional[asyncio.Task]):
+    if prefetch is not None and not prefetch.done():
+        prefetch.cancel()
+
+
+def schedule_write(coro):
+    """Run a DB write without holding up the poll; stop_polling waits for it."""
+    task = asyncio.create_task(coro)
+    pipeline.state.pending_writes.add(task)
+    task.add_done_callback(_write_done)
+
+
+async def find_authenticated_user(today_str: str) -> Optional[str]:
     """
     Stage 0: Find an authenticated user with valid tokens from today.
+    `today_str` is today's IST date (YYYY-MM-DD).
     Returns username if found, None otherwise.
     """
-    now_utc = datetime.now(timezone.utc)
-    now_ist = now_utc + timedelta(hours=5, minutes=30)
-    today_str = now_ist.strftime("%Y-%m-%d")
+    all_tokens = await asyncio.gather(*(get_user_tokens(user) for user in USERS))
     
-    for user in ["samarth", "prajwal"]:
-        tokens = await get_user_tokens(user)
+    for user, tokens in zip(USERS, all_tokens):
         if not tokens or not tokens.get("access_token"):
             continue
         
@@ -35,23 +81,24 @@ async def find_authenticated_user() -> Optional[str]:
         if updated_at:
             try:
                 if isinstance(updated_at, datetime):
-                    if updated_at.tzinfo is not None:
-                        updated_utc = updated_at.astimezone(timezone.utc)
+                    # Stored by store_tokens as a naive UTC datetime: shift to IST
+                    # and compare dates without formatting
+                    if updated_at.tzinfo is None:
+                        updated_ist = updated_at + IST_OFFSET
                     else:
-                        updated_utc = updated_at.replace(tzinfo=timezone.utc)
-                    updated_ist = updated_utc + timedelta(hours=5, minutes=30)
+                        updated_ist = updated_at.astimezone(IST)
+                    token_date_str = updated_ist.date().isoformat()
                 else:
+                    # Fallback for tokens written as ISO strings
                     updated_dt = datetime.fromisoformat(str(updated_at).replace('Z', '+00:00'))
                     if updated_dt.tzinfo is None:
                         updated_dt = updated_dt.replace(tzinfo=timezone.utc)
-                    updated_utc = updated_dt.astimezone(timezone.utc)
-                    updated_ist = updated_utc + timedelta(hours=5, minutes=30)
+                    token_date_str = updated_dt.astimezone(IST).date().isoformat()
                 
-                token_date_str = updated_ist.strftime("%Y-%m-%d")
                 if token_date_str == today_str:
                     return user
             except Exception as e:
-                print(f"⚠️ Error checking token date for {user}: {e}")
+                logger.warning("⚠️ Error checking token date for %s: %s", user, e)
                 continue
     
     return None
@@ -62,8 +109,6 @@ async def fetch_stage(username: str) -> Optional[Dict]:
     Stage 1: Fetch option chain data from Upstox API.
     Returns raw API response or None on failure.
     """
-    from data_fetcher import fetch_option_chain
-    
     try:
         upstox_data = await asyncio.wait_for(
             fetch_option_chain(username),
@@ -71,10 +116,10 @@ async def fetch_stage(username: str) -> Optional[Dict]:
         )
         return upstox_data
     except asyncio.TimeoutError:
-        print(f"⚠️ API call timeout for {username}")
+        logger.warning("⚠️ API call timeout for %s", username)
         return None
     except Exception as e:
-        print(f"⚠️ Fetch error for {username}: {e}")
+        logger.warning("⚠️ Fetch error for %s: %s", username, e)
         return None
 
 
@@ -83,19 +128,17 @@ async def normalize_stage(raw_data: Dict) -> Optional[Dict]:
     Stage 2: Normalize the raw Upstox API response to our data model.
     Returns normalized data or None on failure.
     """
-    from data_fetcher import normalize_option_chain
-    
     try:
         normalized = normalize_option_chain(raw_data)
         if not normalized:
-            print("⚠️ Failed to normalize option chain data")
+            logger.warning("⚠️ Failed to normalize option chain data")
             return None
         if not normalized.get("options"):
-            print(f"⚠️ No options found in normalized data")
+            logger.warning("⚠️ No options found in normalized data")
             return None
         return normalized
     except Exception as e:
-        print(f"⚠️ Normalization error: {e}")
+        logger.warning("⚠️ Normalization error: %s", e)
         return None
 
 
@@ -104,31 +147,24 @@ async def aggregate_stage(normalized_data: Dict) -> Optional[Dict]:
     Stage 3: Aggregate Greeks for Call and Put sides (ATM + 10 OTM).
     Returns aggregated Greeks dict.
     """
-    from utils import aggregate_greeks_atm_otm
-    
     try:
         aggregated = aggregate_greeks_atm_otm(normalized_data)
         return aggregated
     except Exception as e:
-        print(f"⚠️ Aggregation error: {e}")
+        logger.warning("⚠️ Aggregation error: %s", e)
         return None
 
 
-async def baseline_stage(username: str, aggregated: Dict) -> tuple:
+async def baseline_stage(username: str, aggregated: Dict, baseline_date: str) -> tuple:
     """
     Stage 4: Handle baseline Greeks - load from DB or capture new.
+    `baseline_date` is the UTC date (YYYY-MM-DD) baselines are stored under.
     Returns (baseline_greeks, change_from_baseline).
     """
-    from data_fetcher import (
-        get_daily_baseline, save_daily_baseline, 
-        calculate_change_from_baseline
-    )
-    
     state = pipeline.state
     
     if state.baseline_greeks is None:
-        today_str = datetime.now(timezone.utc).strftime("%Y-%m-%d")
-        db_baseline = await get_daily_baseline(username, today_str)
+        db_baseline = await get_daily_baseline(username, baseline_date)
         if db_baseline:
             state.baseline_greeks = db_baseline
     
@@ -139,9 +175,8 @@ async def baseline_stage(username: str, aggregated: Dict) -> tuple:
     
     if is_baseline_invalid and aggregated:
         state.baseline_greeks = aggregated
-        print("📈 Baseline greeks captured for the day.")
-        today_str = datetime.now(timezone.utc).strftime("%Y-%m-%d")
-        await save_daily_baseline(username, today_str, state.baseline_greeks)
+        logger.info("📈 Baseline greeks captured for the day.")
+        schedule_write(save_daily_baseline(username, baseline_date, state.baseline_greeks))
     
     change_from_baseline = calculate_change_from_baseline(
         aggregated, state.baseline_greeks if state.baseline_greeks else {}
@@ -150,21 +185,14 @@ async def baseline_stage(username: str, aggregated: Dict) -> tuple:
     return state.baseline_greeks, change_from_baseline
 
 
-async def fetch_supplementary_data_stage(username: str, settings: Dict) -> Dict:
+async def fetch_supplementary_data_stage(username: str, settings: Dict, today_str: str) -> Dict:
     """
     Stage 5: Fetch supplementary data (previous day OHLC, open candle).
+    `today_str` is today's IST date (YYYY-MM-DD).
     Updates settings with fetched data.
     Returns updated settings.
     """
-    from data_fetcher import (
-        fetch_and_store_previous_day_data,
-        fetch_current_day_open_candle
-    )
-    
     state = pipeline.state
-    now_utc = datetime.now(timezone.utc)
-    now_ist = now_utc + timedelta(hours=5, minutes=30)
-    today_str = now_ist.strftime("%Y-%m-%d")
     
     last_fetched_date = state.prev_day_stats_fetched_for.get(username)
     if last_fetched_date != today_str:
@@ -172,9 +200,9 @@ async def fetch_supplementary_data_stage(username: str, settings: Dict) -> Dict:
             ohlc = await fetch_and_store_previous_day_data(username)
             if ohlc:
                 state.prev_day_stats_fetched_for[username] = today_str
-                settings = await get_user_settings(username) or {}
+                settings = await get_cached_user_settings(username) or {}
         except Exception as e:
-            print(f"⚠️ Error fetching previous-day data: {e}")
+            logger.warning("⚠️ Error fetching previous-day data: %s", e)
     
     last_open_candle_date = state.current_day_open_candle_fetched_for.get(username)
     if last_open_candle_date != today_str:
@@ -191,9 +219,9 @@ async def fetch_supplementary_data_stage(username: str, settings: Dict) -> Dict:
                 state.open_price_from_candle = candle_open_price
                 if state.open_price != candle_open_price:
                     state.open_price = candle_open_price
-                    print(f"🔄 Updated day's open price to candle open: {state.open_price}")
+                    logger.info("🔄 Updated day's open price to candle open: %s", state.open_price)
         except Exception as e:
-            print(f"⚠️ Error fetching open candle: {e}")
+            logger.warning("⚠️ Error fetching open candle: %s", e)
     
     return settings
 
@@ -207,17 +235,15 @@ async def volatility_stage(
     Stage 6: Calculate volatility metrics (RV, IV, market state).
     Returns volatility metrics dict.
     """
-    from volatility_model import calculate_volatility_metrics
-    
     state = pipeline.state
     
     if state.open_price is None or state.market_open_time is None:
-        print("⚠️ Skipping volatility: open_price or market_open_time not set")
+        logger.warning("⚠️ Skipping volatility: open_price or market_open_time not set")
         return None
     
     current_price = normalized_data["underlying_price"]
     price_15min_ago = pipeline.get_price_15min_ago(current_time)
-    price_series_15min = [p.price for p in state.price_history]
+    price_series_15min = pipeline.get_rolling_window_endpoints()
     
     prev_volatility_data = (
         state.latest_data.get("volatility_metrics") 
@@ -225,8 +251,11 @@ async def volatility_stage(
     )
     rv_ratio_prev = prev_volatility_data.get("rv_ratio") if prev_volatility_data else None
     
+    full_day_timestamps, full_day_prices = pipeline.get_full_day_arrays()
+    
     try:
-        volatility_metrics = calculate_volatility_metrics(
+        volatility_metrics = await asyncio.to_thread(
+            calculate_volatility_metrics,
             current_price=current_price,
             price_15min_ago=price_15min_ago,
             price_series_15min=price_series_15min,
@@ -236,7 +265,9 @@ async def volatility_stage(
             options=normalized_data["options"],
             atm_strike=normalized_data["atm_strike"],
             underlying_price=current_price,
-            full_day_price_history=pipeline.get_full_day_prices_as_dicts(),
+            full_day_timestamps=full_day_timestamps,
+            full_day_prices=full_day_prices,
+            option_arrays=get_option_arrays(normalized_data),
             rv_ratio_prev=rv_ratio_prev,
             prev_volatility_metrics=prev_volatility_data,
             rv_ratio_contraction_threshold=settings.get("vol_rv_ratio_contraction_threshold", 0.8),
@@ -245,9 +276,7 @@ async def volatility_stage(
         )
         return volatility_metrics
     except Exception as e:
-        print(f"⚠️ Volatility calculation error: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.error("⚠️ Volatility calculation error: %s", e, exc_info=True)
         return None
 
 
@@ -259,27 +288,25 @@ async def direction_stage(
     Stage 7: Calculate direction & asymmetry metrics.
     Returns direction metrics dict.
     """
-    from direction_model import calculate_direction_metrics
-    
     state = pipeline.state
     
     if state.open_price is None or state.market_open_time is None:
-        print("⚠️ Skipping direction: open_price or market_open_time not set")
+        logger.warning("⚠️ Skipping direction: open_price or market_open_time not set")
         return None
     
     try:
-        direction_metrics = calculate_direction_metrics(
+        direction_metrics = await asyncio.to_thread(
+            calculate_direction_metrics,
             price_history=pipeline.get_full_day_prices_as_dicts(),
             market_open_time=state.market_open_time,
             current_time=current_time,
             settings=settings,
             open_price=state.open_price,
+            price_path_length=pipeline.get_full_day_path_length(),
         )
         return direction_metrics
     except Exception as e:
-        print(f"⚠️ Direction calculation error: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.error("⚠️ Direction calculation error: %s", e, exc_info=True)
         return None
 
 
@@ -292,8 +319,6 @@ async def signals_stage(
     Stage 8: Detect Greek signature signals.
     Returns list of signal detection results.
     """
-    from greek_signals import detect_signals
-    
     state = pipeline.state
     
     try:
@@ -305,7 +330,7 @@ async def signals_stage(
         )
         return signals
     except Exception as e:
-        print(f"⚠️ Signal detection error: {e}")
+        logger.warning("⚠️ Signal detection error: %s", e)
         return []
 
 
@@ -315,6 +340,11 @@ async def broadcast_stage(data: Dict):
     """
     state = pipeline.state
     
+    # Nobody to send to: skip serializing the snapshot. With Redis the other
+    # workers' clients still need it, so always publish then.
+    if not manager.has_clients() and not manager.redis_enabled:
+        return
+    
     try:
         if manager:
             await manager.broadcast(data)
@@ -322,49 +352,68 @@ async def broadcast_stage(data: Dict):
             if state.data_sequence % 10 == 0:
                 await manager.cleanup_stale_connections(max_age_seconds=300)
     except Exception as e:
-        print(f"⚠️ Broadcast error: {e}")
+        logger.warning("⚠️ Broadcast error: %s", e)
 
 
 async def log_stage(data: Dict):
     """
     Stage 10: Log market data to database for ML training.
+    Only queues the snapshot; the batched write happens in market_data_log_flusher.
     """
     try:
-        await log_market_data(data)
+        log_market_data(data)
     except Exception as e:
-        print(f"⚠️ Log error: {e}")
+        logger.warning("⚠️ Log error: %s", e)
 
 
-async def run_pipeline_cycle(username: str) -> bool:
+async def broadcast_and_log_stage(snapshot: PipelineSnapshot):
     """
-    Execute one complete pipeline cycle with all stages in sequence.
-    Returns True if successful, False otherwise.
-    
-    This function MUST be called while holding the pipeline lock.
+    Stages 9 and 10: broadcast and log a published snapshot.
+    Clients get the slim broadcast_payload, the log gets the full latest_data.
+    They are independent, so they run concurrently (each stage catches and
+    reports its own errors). Runs after the pipeline lock is released.
+    """
+    pipeline.state.current_stage = PipelineStage.BROADCASTING
+    await asyncio.gather(
+        broadcast_stage(snapshot.broadcast_payload),
+        log_stage(snapshot.latest_data),
+        return_exceptions=True
+    )
+    pipeline.state.current_stage = PipelineStage.COMPLETE
+
+
+async def run_pipeline_cycle(
+    username: str,
+    now_utc: datetime,
+    today_str: str,
+    prefetch: Optional[asyncio.Task] = None
+) -> Optional[PipelineSnapshot]:
+    """
+    Execute the fetch and calculation stages of one pipeline cycle in sequence
+    and publish the result. `now_utc` and `today_str` (IST date) are computed
+    once per poll by the caller; `prefetch` is an already running fetch_stage
+    task for `username`, used instead of fetching again.
+    Returns the published snapshot if successful, None otherwise.
+    
+    This function MUST be called while holding the pipeline lock. The caller
+    broadcasts and logs the result with broadcast_and_log_stage once the lock
+    is released.
     """
     state = pipeline.state
     
     state.current_stage = PipelineStage.FETCHING
-    raw_data = await fetch_stage(username)
+    raw_data = await (prefetch if prefetch is not None else fetch_stage(username))
     if not raw_data:
-        return False
+        return None
     
     state.raw_option_chain = raw_data
     
     state.current_stage = PipelineStage.NORMALIZING
     normalized_data = await normalize_stage(raw_data)
     if not normalized_data:
-        return False
+        return None
     
-    timestamp_str = normalized_data["timestamp"]
-    if timestamp_str.endswith('Z'):
-        timestamp_str = timestamp_str.replace('Z', '+00:00')
-    try:
-        current_time = datetime.fromisoformat(timestamp_str)
-        if current_time.tzinfo is None:
-            current_time = current_time.replace(tzinfo=timezone.utc)
-    except (ValueError, AttributeError):
-        current_time = datetime.now(timezone.utc)
+    current_time = normalized_data["timestamp_dt"]
     
     current_price = normalized_data["underlying_price"]
     pipeline.update_price_history(current_price, current_time)
@@ -372,30 +421,36 @@ async def run_pipeline_cycle(username: str) -> bool:
     state.current_stage = PipelineStage.AGGREGATING
     aggregated = await aggregate_stage(normalized_data)
     if not aggregated:
-        return False
+        return None
     
     state.current_stage = PipelineStage.CALCULATING_BASELINE
-    baseline_greeks, change_from_baseline = await baseline_stage(username, aggregated)
+    baseline_greeks, change_from_baseline = await baseline_stage(
+        username, aggregated, now_utc.date().isoformat()
+    )
     
-    settings = await get_user_settings(username) or {}
+    settings = await get_cached_user_settings(username) or {}
     
     state.current_stage = PipelineStage.CALCULATING_VOLATILITY
-    settings = await fetch_supplementary_data_stage(username, settings)
+    settings = await fetch_supplementary_data_stage(username, settings, today_str)
     
     if state.open_price is None or state.market_open_time is None:
-        print("⚠️ Skipping metrics: open_price or market_open_time not yet available")
-        return False
-    
-    volatility_metrics = await volatility_stage(normalized_data, settings, current_time)
+        logger.warning("⚠️ Skipping metrics: open_price or market_open_time not yet available")
+        return None
     
+    # Volatility and direction only read the price history, so both models
+    # run side by side in worker threads, keeping the event loop responsive
     state.current_stage = PipelineStage.CALCULATING_DIRECTION
-    direction_metrics = await direction_stage(settings, current_time)
+    volatility_metrics, direction_metrics = await asyncio.gather(
+        volatility_stage(normalized_data, settings, current_time),
+        direction_stage(settings, current_time)
+    )
     
     state.current_stage = PipelineStage.DETECTING_SIGNALS
     signals = await signals_stage(normalized_data, change_from_baseline, username)
     
     state.data_sequence += 1
     state.last_successful_poll = datetime.now(timezone.utc)
+    state.last_successful_poll_monotonic = time.monotonic()
     state.stall_warning_sent = False
     
     latest_data = {
@@ -415,16 +470,13 @@ async def run_pipeline_cycle(username: str) -> bool:
         "direction_metrics": direction_metrics,
     }
     
-    state.latest_data = latest_data
-    
-    state.current_stage = PipelineStage.BROADCASTING
-    await broadcast_stage(latest_data)
-    
-    state.current_stage = PipelineStage.LOGGING
-    await log_stage(latest_data)
+    broadcast_payload = {
+        **latest_data,
+        "options": options_near_atm(normalized_data, BROADCAST_STRIKES_EACH_SIDE),
+    }
     
-    state.current_stage = PipelineStage.COMPLETE
-    return True
+    state.latest_data = latest_data
+    return pipeline.publish(broadcast_payload)
 
 
 async def polling_worker():
@@ -435,37 +487,63 @@ async def polling_worker():
     state = pipeline.state
     state.polling_active = True
     
-    print("Pipeline worker started. Operating during market hours (09:15 - 15:30 IST).")
+    logger.info("Pipeline worker started. Operating during market hours (09:15 - 15:30 IST).")
+    
+    # Polls are scheduled against absolute deadlines on the monotonic clock,
+    # so a slow cycle doesn't shift every later one; the wall clock is only
+    # used for dates and timestamps
+    next_poll = time.monotonic()
     
     while state.polling_active:
-        poll_start_time = datetime.now(timezone.utc)
-        
+        # Clock readings shared by every stage of this poll
         now_utc = datetime.now(timezone.utc)
         now_ist = now_utc + timedelta(hours=5, minutes=30)
         
         if now_ist.weekday() >= 5:
             if state.current_user:
-                print(f"📅 Weekend ({now_ist.strftime('%A')}). Stopping polling.")
+                logger.info("📅 Weekend (%s). Stopping polling.", now_ist.strftime('%A'))
                 state.current_user = None
                 state.latest_data = None
+                pipeline.publish()
             await asyncio.sleep(3600)
             continue
         
         if not pipeline.is_market_hours():
             if state.current_user:
-                print(f"🕒 Market closed ({now_ist.time().strftime('%H:%M')}). Stopping polling.")
+                logger.info("🕒 Market closed (%s). Stopping polling.", now_ist.time().strftime('%H:%M'))
                 state.current_user = None
                 state.latest_data = None
+                pipeline.publish()
             await asyncio.sleep(60)
             continue
         
-        found_user = await find_authenticated_user()
+        today_str = now_ist.strftime("%Y-%m-%d")
+        
+        # The option chain fetch doesn't depend on the token check, so start it
+        # for the user already being polled and let the two round trips overlap
+        prefetch = None
+        if state.current_user and state.should_poll:
+            prefetch = asyncio.create_task(fetch_stage(state.current_user))
+            prefetch.add_done_callback(_prefetch_done)
+        
+        # Until the cycle's try/finally takes over, cancel the prefetch on any
+        # exit from an await (errors and task cancellation alike)
+        try:
+            found_user = await find_authenticated_user(today_str)
+        except BaseException:
+            _cancel_prefetch(prefetch)
+            raise
+        
+        if prefetch is not None and (found_user != state.current_user or not state.should_poll):
+            _cancel_prefetch(prefetch)
+            prefetch = None
         
         if not found_user:
             if state.current_user:
-                print("⚠️ No authenticated user with today's tokens. Waiting for login...")
+                logger.warning("⚠️ No authenticated user with today's tokens. Waiting for login...")
                 state.current_user = None
                 state.latest_data = None
+                pipeline.publish()
             await asyncio.sleep(5)
             continue
         
@@ -475,8 +553,8 @@ async def polling_worker():
         
         if found_user != state.current_user:
             state.current_user = found_user
-            print(f"✓ Authenticated user found: {state.current_user}")
-            print(f"Starting polling for {state.current_user}...")
+            logger.info("✓ Authenticated user found: %s", state.current_user)
+            logger.info("Starting polling for %s...", state.current_user)
             
             state.latest_data = {
                 "timestamp": datetime.now(timezone.utc).isoformat(),
@@ -490,49 +568,62 @@ async def polling_worker():
                 "atm_strike": None,
                 "message": f"Authenticated as {state.current_user}. Waiting for first data poll..."
             }
+            pipeline.publish()
         
-        lock_acquired = await pipeline.acquire_lock(timeout=10.0)
+        try:
+            lock_acquired = await pipeline.acquire_lock(timeout=10.0)
+        except BaseException:
+            _cancel_prefetch(prefetch)
+            raise
         if not lock_acquired:
-            print("⚠️ Could not acquire pipeline lock, skipping cycle")
+            _cancel_prefetch(prefetch)
+            logger.warning("⚠️ Could not acquire pipeline lock, skipping cycle")
             await asyncio.sleep(5)
             continue
         
+        snapshot = None
         try:
             if not state.current_user:
-                print("⚠️ No authenticated user, skipping cycle")
+                logger.warning("⚠️ No authenticated user, skipping cycle")
                 continue
-            success = await run_pipeline_cycle(state.current_user)
-            if not success:
-                if state.last_successful_poll:
-                    time_since_success = (
-                        datetime.now(timezone.utc) - state.last_successful_poll
-                    ).total_seconds()
+            snapshot = await run_pipeline_cycle(state.current_user, now_utc, today_str, prefetch)
+            if snapshot is None:
+                if state.last_successful_poll_monotonic is not None:
+                    time_since_success = time.monotonic() - state.last_successful_poll_monotonic
                     if time_since_success > 30 and not state.stall_warning_sent:
-                        print(f"⚠️ STALL DETECTED: No successful poll in {time_since_success:.1f}s")
+                        logger.warning("⚠️ STALL DETECTED: No successful poll in %.1fs", time_since_success)
                         state.stall_warning_sent = True
         except asyncio.CancelledError:
             break
         except Exception as e:
-            print(f"Error in pipeline cycle: {str(e)}")
-            import traceback
-            traceback.print_exc()
+            logger.error("Error in pipeline cycle: %s", e, exc_info=True)
         finally:
             pipeline.release_lock()
+            _cancel_prefetch(prefetch)
             
-            poll_duration = (datetime.now(timezone.utc) - poll_start_time).total_seconds()
-            sleep_time = max(0, 5.0 - poll_duration)
+            # The snapshot is never mutated after publishing, so WebSocket
+            # sends and logging don't need to hold up other lock users
+            if snapshot is not None:
+                await broadcast_and_log_stage(snapshot)
+            
+            next_poll += POLL_INTERVAL
+            sleep_time = next_poll - time.monotonic()
+            if sleep_time < -POLL_INTERVAL:
+                # Too far behind (or resuming after an idle wait): restart the cadence
+                next_poll = time.monotonic() + POLL_INTERVAL
+                sleep_time = POLL_INTERVAL
             if sleep_time > 0:
                 await asyncio.sleep(sleep_time)
     
     state.polling_active = False
     state.should_poll = False
-    print("Pipeline worker stopped")
+    logger.info("Pipeline worker stopped")
 
 
 async def start_polling():
     """Start the polling worker with singleton guard."""
     if pipeline._polling_task is not None and not pipeline._polling_task.done():
-        print("⚠️ Polling worker already running, skipping duplicate start")
+        logger.warning("⚠️ Polling worker already running, skipping duplicate start")
         return
     pipeline._polling_task = asyncio.create_task(polling_worker())
 
@@ -550,18 +641,29 @@ async def stop_polling():
         except asyncio.CancelledError:
             pass
     pipeline._polling_task = None
-    print("🛑 Pipeline polling stopped")
+    
+    # Let background DB writes finish before shutting down
+    if state.pending_writes:
+        await asyncio.gather(*state.pending_writes, return_exceptions=True)
+    
+    # Write snapshots still waiting for the next batch
+    try:
+        await flush_market_data_log()
+    except Exception as e:
+        logger.warning("⚠️ Market data log flush error: %s", e)
+    logger.info("🛑 Pipeline polling stopped")
 
 
 def enable_polling():
     """Enable polling - called after successful login."""
     state = pipeline.state
     state.latest_data = None
+    pipeline.publish()
     state.baseline_greeks = None
     state.current_day_open_candle_fetched_for.clear()
     state.prev_day_stats_fetched_for.clear()
     state.should_poll = True
-    print("✅ Polling enabled - will start fetching data with today's fresh tokens")
+    logger.info("✅ Polling enabled - will start fetching data with today's fresh tokens")
 
 
 def disable_polling():
@@ -569,18 +671,24 @@ def disable_polling():
     state = pipeline.state
     state.should_poll = False
     state.latest_data = None
+    pipeline.publish()
     state.baseline_greeks = None
-    print("🛑 Polling disabled - will stop fetching data")
+    logger.info("🛑 Polling disabled - will stop fetching data")
 
 
 def get_latest_data() -> Optional[Dict]:
-    """Get the latest data from the pipeline state."""
-    return pipeline.state.latest_data
+    """Get the latest data from the published pipeline snapshot (lock-free)."""
+    return pipeline.snapshot.latest_data
+
+
+def get_broadcast_payload() -> Optional[Dict]:
+    """Get the payload last sent to WebSocket clients from the published snapshot (lock-free)."""
+    return pipeline.snapshot.broadcast_payload
 
 
 def get_current_user() -> Optional[str]:
-    """Get the currently authenticated user."""
-    return pipeline.state.current_user
+    """Get the currently authenticated user from the published pipeline snapshot (lock-free)."""
+    return pipeline.snapshot.current_user
 
 
 async def reset_baseline():
@@ -591,7 +699,8 @@ async def reset_baseline():
     
     try:
         pipeline.state.baseline_greeks = None
-        pipeline.state.price_history = []
-        pipeline.state.full_day_price_history = []
+        pipeline.state.price_history.clear()
+        pipeline.state.full_day_price_history.clear()
+        pipeline.state.full_day_series.clear()
     finally:
         pipeline.release_lock()
@@ -0,0 +1,24 @@
+"""
+Uvicorn settings shared by the dev server (python main.py) and production
+(gunicorn -k backend.server_config.UvicornWorker).
+
+Kept free of app imports so gunicorn can load the worker class in the master
+process without starting the app.
+"""
+from uvicorn.workers import UvicornWorker as _BaseUvicornWorker
+
+# WebSocket settings. Liveness is checked with protocol-level PING/PONG frames;
+# clients only ever send small heartbeats, so inbound frames are capped.
+# permessage-deflate is uvicorn's default and stays on: every broadcast is a
+# full multi-KB JSON snapshot.
+WS_CONFIG = {
+    "ws": "websockets",
+    "ws_ping_interval": 30.0,
+    "ws_ping_timeout": 20.0,
+    "ws_max_size": 64 * 1024,
+}
+
+
+class UvicornWorker(_BaseUvicornWorker):
+    """gunicorn worker that applies WS_CONFIG"""
+    CONFIG_KWARGS = {**_BaseUvicornWorker.CONFIG_KWARGS, **WS_CONFIG}
@@ -1,4 +1,79 @@
-from typing import Dict
+from typing import Dict, List
+
+import numpy as np
+
+GREEK_FIELDS = ("delta", "vega", "theta", "gamma")
+# Numeric per-option columns in the array view
+OPTION_FIELDS = GREEK_FIELDS + ("iv", "volume")
+
+# Sorted unique strikes keyed by the raw strike column. The chain's strikes
+# rarely change intraday, so the sort only reruns when the layout changes;
+# the cache is dropped whenever the expiry rolls.
+_STRIKE_CACHE_MAX = 64
+_strike_cache: Dict[bytes, np.ndarray] = {}
+_strike_cache_expiry = None
+
+
+def build_option_arrays(options: List[Dict]) -> Dict[str, np.ndarray]:
+    """
+    Columnar (structure-of-arrays) view of an option chain: one float64 array
+    per field plus boolean CE/PE masks, all aligned with `options`.
+    """
+    count = len(options)
+    types = [opt["type"] for opt in options]
+    arrays = {
+        "strike": np.fromiter((opt["strike"] for opt in options), dtype=np.float64, count=count),
+        "is_call": np.fromiter((t == "CE" for t in types), dtype=bool, count=count),
+        "is_put": np.fromiter((t == "PE" for t in types), dtype=bool, count=count),
+    }
+    for name in OPTION_FIELDS:
+        arrays[name] = np.fromiter((opt.get(name) or 0.0 for opt in options), dtype=np.float64, count=count)
+    return arrays
+
+
+def get_option_arrays(normalized_data: Dict) -> Dict[str, np.ndarray]:
+    """Option arrays for this chain, built once and cached on normalized_data["option_arrays"]."""
+    arrays = normalized_data.get("option_arrays")
+    if arrays is None:
+        arrays = build_option_arrays(normalized_data.get("options", []))
+        normalized_data["option_arrays"] = arrays
+    return arrays
+
+
+def _unique_strikes(strikes: np.ndarray, expiry_date) -> np.ndarray:
+    global _strike_cache_expiry
+    if expiry_date != _strike_cache_expiry or len(_strike_cache) >= _STRIKE_CACHE_MAX:
+        _strike_cache.clear()
+        _strike_cache_expiry = expiry_date
+    key = strikes.tobytes()
+    all_strikes = _strike_cache.get(key)
+    if all_strikes is None:
+        all_strikes = np.unique(strikes)
+        _strike_cache[key] = all_strikes
+    return all_strikes
+
+
+def get_unique_strikes(arrays: Dict[str, np.ndarray], expiry_date=None) -> np.ndarray:
+    """
+    Sorted unique strikes of a chain, computed once per option arrays view and
+    kept on it as arrays["unique_strikes"]. With expiry_date the result also
+    comes from (and goes into) the cross-poll strike cache.
+    """
+    all_strikes = arrays.get("unique_strikes")
+    if all_strikes is None:
+        if expiry_date is not None:
+            all_strikes = _unique_strikes(arrays["strike"], expiry_date)
+        else:
+            all_strikes = np.unique(arrays["strike"])
+        arrays["unique_strikes"] = all_strikes
+    return all_strikes
+
+
+def _sum_greeks(arrays: Dict[str, np.ndarray], mask: np.ndarray) -> Dict:
+    totals = {greek: float(arrays[greek][mask].sum()) for greek in GREEK_FIELDS}
+    totals["option_count"] = int(np.count_nonzero(mask))
+    return totals
+
 
 def aggregate_greeks_atm_otm(normalized_data: Dict) -> Dict:
     """
@@ -7,33 +82,47 @@ def aggregate_greeks_atm_otm(normalized_data: Dict) -> Dict:
     """
     atm_strike = normalized_data.get("atm_strike")
     options = normalized_data.get("options", [])
-    
+
     if not atm_strike or not options:
         return {"call": {}, "put": {}}
 
-    # Sort strikes to easily find OTM
-    all_strikes = sorted(list(set(opt['strike'] for opt in options)))
-    
-    try:
-        atm_index = all_strikes.index(atm_strike)
-    except ValueError:
+    arrays = get_option_arrays(normalized_data)
+    strikes = arrays["strike"]
+
+    # Sorted unique strikes to easily find OTM
+    all_strikes = get_unique_strikes(arrays, normalized_data.get("expiry_date"))
+    atm_index = int(np.searchsorted(all_strikes, atm_strike))
+    if atm_index == len(all_strikes) or all_strikes[atm_index] != atm_strike:
         return {"call": {}, "put": {}} # ATM strike not in list
 
-    # Define the 11 strikes for Calls (ATM and higher) and Puts (ATM and lower)
-    call_strikes = set(all_strikes[atm_index : atm_index + 11])
-    put_strikes = set(all_strikes[max(0, atm_index - 10) : atm_index + 1])
-
-    call_greeks = {"delta": 0, "vega": 0, "theta": 0, "gamma": 0, "option_count": 0}
-    put_greeks = {"delta": 0, "vega": 0, "theta": 0, "gamma": 0, "option_count": 0}
-
-    for opt in options:
-        if opt['type'] == 'CE' and opt['strike'] in call_strikes:
-            for greek in call_greeks:
-                if greek != "option_count": call_greeks[greek] += opt.get(greek, 0)
-            call_greeks['option_count'] += 1
-        elif opt['type'] == 'PE' and opt['strike'] in put_strikes:
-            for greek in put_greeks:
-                if greek != "option_count": put_greeks[greek] += opt.get(greek, 0)
-            put_greeks['option_count'] += 1
-            
-    return {"call": call_greeks, "put": put_greeks}
\ No newline at end of file
+    # The 11 strikes for Calls (ATM and higher) and Puts (ATM and lower) are
+    # contiguous in the sorted list, so each side is a single range check
+    call_high = all_strikes[min(atm_index + 10, len(all_strikes) - 1)]
+    put_low = all_strikes[max(0, atm_index - 10)]
+
+    call_mask = arrays["is_call"] & (strikes >= atm_strike) & (strikes <= call_high)
+    put_mask = arrays["is_put"] & (strikes >= put_low) & (strikes <= atm_strike)
+
+    return {"call": _sum_greeks(arrays, call_mask), "put": _sum_greeks(arrays, put_mask)}
+
+
+def options_near_atm(normalized_data: Dict, strikes_each_side: int) -> List[Dict]:
+    """
+    Options whose strike lies within `strikes_each_side` strikes of ATM, in chain order.
+    Returns the full list when the ATM strike is unknown or not in the chain.
+    """
+    atm_strike = normalized_data.get("atm_strike")
+    options = normalized_data.get("options", [])
+    if not atm_strike or not options:
+        return options
+
+    arrays = get_option_arrays(normalized_data)
+    strikes = arrays["strike"]
+    all_strikes = get_unique_strikes(arrays, normalized_data.get("expiry_date"))
+    atm_index = int(np.searchsorted(all_strikes, atm_strike))
+    if atm_index == len(all_strikes) or all_strikes[atm_index] != atm_strike:
+        return options
+
+    low = all_strikes[max(0, atm_index - strikes_each_side)]
+    high = all_strikes[min(atm_index + strikes_each_side, len(all_strikes) - 1)]
+    return [options[i] for i in np.flatnonzero((strikes >= low) & (strikes <= high))]
@@ -4,8 +4,13 @@ Calculates RV(current), RV(open-normalized), IV(ATM), IV-VWAP
 and determines market states: CONTRACTION, TRANSITION, EXPANSION
 """
 from typing import Dict, List, Optional, Tuple
-from datetime import datetime, timedelta, timezone
-import statistics
+from datetime import datetime, timezone
+from functools import lru_cache
+from types import MappingProxyType
+
+import numpy as np
+
+from utils import build_option_arrays, get_unique_strikes
 
 
 def calculate_rv_current(price_series_15min: Optional[List[float]]) -> Optional[float]:
@@ -13,6 +18,7 @@ def calculate_rv_current(price_series_15min: Optional[List[float]]) -> Optional[
     Calculate RV(current) - 15-minute displacement.
     
     RV_current = abs(Price_last - Price_first) over the 15-minute window.
+    Only the first and last prices are read, so callers may pass just those two.
     """
     if not price_series_15min or len(price_series_15min) < 2:
         return None
@@ -22,35 +28,48 @@ def calculate_rv_current(price_series_15min: Optional[List[float]]) -> Optional[
     return abs(price_series_15min[-1] - price_series_15min[0])
 
 
-def calculate_rv_open_normalized(current_price: float, open_price: float, 
-                                  market_open_time: datetime, current_time: datetime) -> Optional[float]:
+def calculate_rv_open_normalized_epoch(current_price: float, open_price: float,
+                                        open_epoch: float, current_epoch: float) -> Optional[float]:
     """
     Calculate RV(open-normalized) - day's average movement speed
     1. RV_open(t) = |Price_t - OpenPrice|
     2. RV_open_norm(t) = RV_open(t) / Number of 15-min windows elapsed
+    
+    open_epoch and current_epoch are epoch seconds (datetime.timestamp()).
     """
     if open_price is None or open_price == 0:
         return None
     
-    # Calculate time difference in minutes
-    time_diff = current_time - market_open_time
-    minutes_elapsed = time_diff.total_seconds() / 60
-    
-    # Calculate number of 15-minute windows elapsed
-    windows_elapsed = max(1, minutes_elapsed / 15)  # At least 1 to avoid division by zero
-    
-    # Calculate RV from open
-    rv_open = abs(current_price - open_price)
+    # Number of 15-minute (900 s) windows elapsed, at least 1 to avoid division by zero
+    windows_elapsed = max(1.0, (current_epoch - open_epoch) / 900.0)
     
-    # Normalize by time
-    rv_open_norm = rv_open / windows_elapsed
-    
-    return rv_open_norm
+    # RV from open, normalized by time
+    return abs(current_price - open_price) / windows_elapsed
+
+
+def _median_small(values: List[float]) -> float:
+    """Median of 1-4 values (statistics.median without the generic dispatch)."""
+    n = len(values)
+    if n == 1:
+        return values[0]
+    if n == 2:
+        return (values[0] + values[1]) / 2
+    if n == 3:
+        _, b, _ = sorted(values)
+        return b
+    _, b, c, _ = sorted(values)
+    return (b + c) / 2
+
+
+# Offsets (seconds) of the RV_median window edges from the current time
+_RV_MEDIAN_EDGE_OFFSETS = 900.0 * np.arange(5)
 
 
 def calculate_rv_median(
-    full_day_price_history: List[Dict],
-    current_time: datetime
+    full_day_timestamps: Optional[np.ndarray],
+    full_day_prices: Optional[np.ndarray],
+    current_time: datetime,
+    current_epoch: Optional[float] = None
 ) -> Optional[float]:
     """
     Calculate RV_median as the median of the last 4 completed 15-min windows.
@@ -64,36 +83,38 @@ def calculate_rv_median(
     2. [t-30m, t-15m]
     3. [t-45m, t-30m]
     4. [t-60m, t-45m]
+    
+    full_day_timestamps are epoch seconds in ascending order, aligned with full_day_prices,
+    so each window boundary is found with a binary search instead of a scan.
+    current_epoch, when given, is current_time as epoch seconds.
     """
-    if not full_day_price_history:
+    if full_day_timestamps is None or len(full_day_timestamps) == 0:
         return None
-        
-    rv_values = []
     
-    # Ensure current_time is timezone aware if history is (to avoid comparison errors)
-    if full_day_price_history and full_day_price_history[0]["timestamp"].tzinfo is not None and current_time.tzinfo is None:
-        current_time = current_time.replace(tzinfo=timezone.utc)
-
-    for i in range(4):
-        end_time = current_time - timedelta(minutes=15 * i)
-        start_time = current_time - timedelta(minutes=15 * (i + 1))
-        
-        # Collect prices in this window
-        window_prices = [
-            p["price"] for p in full_day_price_history 
-            if start_time <= p["timestamp"] <= end_time
-        ]
-        
-        if len(window_prices) >= 2:
-            # Displacement: abs(Last - First)
-            rv_values.append(abs(window_prices[-1] - window_prices[0]))
+    if current_epoch is not None:
+        now = current_epoch
+    else:
+        # History timestamps are UTC epochs; treat a naive current_time as UTC too
+        if current_time.tzinfo is None:
+            current_time = current_time.replace(tzinfo=timezone.utc)
+        now = current_time.timestamp()
+
+    # Window edges t, t-15m, ..., t-60m. Window i spans [edges[i+1], edges[i]],
+    # so all boundaries come from two vectorized binary searches
+    edges = now - _RV_MEDIAN_EDGE_OFFSETS
+    firsts = np.searchsorted(full_day_timestamps, edges[1:], side="left")
+    lasts = np.searchsorted(full_day_timestamps, edges[:-1], side="right") - 1
+    
+    # Displacement abs(Last - First) for windows with at least two prices
+    has_move = (lasts - firsts) >= 1
+    rv_values = np.abs(full_day_prices[lasts[has_move]] - full_day_prices[firsts[has_move]]).tolist()
             
     if not rv_values:
         return None
         
-    return statistics.median(rv_values)
+    return _median_small(rv_values)
 
-def _get_atm_cluster_options(options: List[Dict], atm_strike: float) -> List[Dict]:
+def _get_atm_cluster_mask(arrays: Dict[str, np.ndarray], atm_strike: float) -> Optional[np.ndarray]:
     """
     Build the strict ATM IV cluster:
       - ATM CE
@@ -104,92 +125,160 @@ def _get_atm_cluster_options(options: List[Dict], atm_strike: float) -> List[Dic
       - ATM+1 strike PE
 
     We infer ATM±1 by walking the sorted unique strikes around the given ATM strike.
+    Returns a boolean mask over the option arrays (see utils.build_option_arrays),
+    or None if the chain is empty.
     """
-    if not options:
-        return []
+    strikes = arrays["strike"]
+    if strikes.size == 0 or atm_strike is None:
+        return None
 
-    # Collect unique strikes and sort them
-    strikes = sorted({opt.get("strike") for opt in options if opt.get("strike") is not None})
-    if not strikes:
-        return []
+    # Sorted unique strikes, shared with the other users of this chain's arrays
+    unique_strikes = get_unique_strikes(arrays)
 
     # Find the exact ATM strike index
-    try:
-        atm_index = strikes.index(atm_strike)
-    except ValueError:
-        # If the provided ATM strike isn't in the list, find the nearest strike
-        closest_strike = min(strikes, key=lambda s: abs(s - atm_strike))
-        atm_index = strikes.index(closest_strike)
-
-    cluster_strikes: List[float] = []
-    # ATM-1
-    if atm_index - 1 >= 0:
-        cluster_strikes.append(strikes[atm_index - 1])
-    # ATM
-    cluster_strikes.append(strikes[atm_index])
-    # ATM+1
-    if atm_index + 1 < len(strikes):
-        cluster_strikes.append(strikes[atm_index + 1])
-
-    cluster_strike_set = set(cluster_strikes)
-
-    # Filter options for these strikes and for CE/PE only
-    cluster_options: List[Dict] = []
-    for opt in options:
-        strike = opt.get("strike")
-        opt_type = opt.get("type")
-        if strike in cluster_strike_set and opt_type in ("CE", "PE"):
-            cluster_options.append(opt)
-
-    return cluster_options
-
-
-def get_iv_cluster(options: List[Dict], atm_strike: float) -> Optional[float]:
+    atm_index = int(np.searchsorted(unique_strikes, atm_strike))
+    if atm_index == len(unique_strikes) or unique_strikes[atm_index] != atm_strike:
+        # If the provided ATM strike isn't in the list, take the nearer of the two
+        # neighbouring strikes (the lower one on a tie)
+        if atm_index == len(unique_strikes) or (
+            atm_index > 0
+            and atm_strike - unique_strikes[atm_index - 1] <= unique_strikes[atm_index] - atm_strike
+        ):
+            atm_index -= 1
+
+    # ATM-1 .. ATM+1 are neighbours in the sorted strikes, so the cluster is a
+    # plain range check over the strike column
+    low_strike = unique_strikes[max(0, atm_index - 1)]
+    high_strike = unique_strikes[min(atm_index + 1, len(unique_strikes) - 1)]
+
+    # CE/PE options at these strikes
+    return (arrays["is_call"] | arrays["is_put"]) & (strikes >= low_strike) & (strikes <= high_strike)
+
+
+def _iv_cluster_from(arrays: Dict[str, np.ndarray], cluster_mask: np.ndarray) -> Optional[float]:
     """
-    Get IV (ATM-cluster) as the simple average IV of the strict 6-option cluster:
-      ATM CE/PE and ATM±1 strike CE/PE.
+    IV (ATM-cluster): simple average IV of the strict 6-option cluster,
+    ATM CE/PE and ATM±1 strike CE/PE.
     """
-    cluster_options = _get_atm_cluster_options(options, atm_strike)
-    if not cluster_options:
-        return None
+    ivs = arrays["iv"]
+    iv_values = ivs[cluster_mask & (ivs > 0)]
 
-    iv_values = [
-        opt.get("iv")
-        for opt in cluster_options
-        if opt.get("iv") is not None and opt.get("iv") > 0
-    ]
-
-    if not iv_values:
+    if iv_values.size == 0:
         return None
 
-    return sum(iv_values) / len(iv_values)
+    return float(iv_values.mean())
 
 
-def calculate_iv_vwap(options: List[Dict], atm_strike: float) -> Optional[float]:
+def _iv_vwap_from(arrays: Dict[str, np.ndarray], cluster_mask: np.ndarray) -> Optional[float]:
     """
-    Calculate IV-VWAP over the strict ATM IV cluster only.
+    IV-VWAP over the strict ATM IV cluster only.
 
     IV_VWAP(t) = Σ(IV_i × Volume_i) / Σ Volume_i
     """
-    cluster_options = _get_atm_cluster_options(options, atm_strike)
-    if not cluster_options:
-        return None
-    
-    total_iv_volume = 0.0
-    total_volume = 0.0
-    
-    for opt in cluster_options:
-        iv = opt.get("iv", 0)
-        volume = opt.get("volume", 0)
-        
-        if iv and iv > 0 and volume and volume > 0:
-            total_iv_volume += iv * volume
-            total_volume += volume
+    ivs = arrays["iv"]
+    volumes = arrays["volume"]
+    traded = cluster_mask & (ivs > 0) & (volumes > 0)
     
+    # Zero weight outside the cluster instead of gathering it, so both sums
+    # are straight reductions over the whole chain
+    weights = np.where(traded, volumes, 0.0)
+    total_volume = float(weights.sum())
     if total_volume == 0:
         return None
     
-    return total_iv_volume / total_volume
+    return float(np.dot(np.where(traded, ivs, 0.0), weights)) / total_volume
+
+
+def calculate_iv_metrics(
+    options: List[Dict],
+    atm_strike: float,
+    option_arrays: Optional[Dict[str, np.ndarray]] = None,
+) -> Tuple[Optional[float], Optional[float]]:
+    """
+    IV (ATM-cluster) and IV-VWAP from a single selection of the ATM cluster.
+    Returns (iv_cluster, iv_vwap).
+    """
+    arrays = option_arrays if option_arrays is not None else build_option_arrays(options)
+    cluster_mask = _get_atm_cluster_mask(arrays, atm_strike)
+    if cluster_mask is None:
+        return None, None
+    return _iv_cluster_from(arrays, cluster_mask), _iv_vwap_from(arrays, cluster_mask)
+
+
+# Outcomes of the market state decision
+_CONTRACTION, _GUARDRAIL, _TRANSITION, _EXPANSION, _GREY_ZONE, _DEFAULT = range(6)
+
+_STABLE_STATES = ("CONTRACTION", "TRANSITION", "EXPANSION")
+
+
+def _build_state_table() -> Tuple[int, ...]:
+    """
+    Outcome for every combination of the five condition bits used by
+    determine_market_state, applying the rules in priority order:
+      bit 0: contraction conditions met
+      bit 1: transition conditions met
+      bit 2: expansion conditions met
+      bit 3: within the transition guardrail
+      bit 4: previous state is one of _STABLE_STATES
+    """
+    table = []
+    for index in range(32):
+        if index & 1:
+            outcome = _CONTRACTION
+        elif index & 2:
+            outcome = _GUARDRAIL if index & 8 else _TRANSITION
+        elif index & 4:
+            outcome = _EXPANSION
+        elif index & 16:
+            outcome = _GREY_ZONE
+        else:
+            outcome = _DEFAULT
+        table.append(outcome)
+    return tuple(table)
+
+
+_STATE_TABLE = _build_state_table()
+
+# State name per outcome (the grey zone keeps the previous state)
+_STATE_NAMES = {
+    _CONTRACTION: "CONTRACTION",
+    _GUARDRAIL: "CONTRACTION",
+    _TRANSITION: "TRANSITION",
+    _EXPANSION: "EXPANSION",
+    _DEFAULT: "UNKNOWN",
+}
+
+# Fixed state_info fields per outcome (read-only; copied into each state_info)
+_STATE_INFO_TEMPLATES = {
+    _CONTRACTION: MappingProxyType({"action": "NO TRADE - No naked buying", "stabilization": "Strict condition met"}),
+    _GUARDRAIL: MappingProxyType({"action": "NO TRADE - Wait for guardrail period to pass", "stabilization": "Guardrail active"}),
+    _TRANSITION: MappingProxyType({"action": "VALID ENTRY ZONE - Buy options here", "stabilization": "Strict condition met"}),
+    _EXPANSION: MappingProxyType({"action": "DO NOT ENTER FRESH - Manage existing trades only", "stabilization": "Strict condition met"}),
+    _GREY_ZONE: MappingProxyType({"action": "HOLD STATE - Metrics in buffer zone", "stabilization": "Grey Zone Active"}),
+    _DEFAULT: MappingProxyType({"action": "NO TRADE"}),
+}
+
+_GREY_ZONE_REASONS = {
+    state: f"Grey Zone - Retaining previous state ({state})" for state in _STABLE_STATES
+}
+
+
+@lru_cache(maxsize=32)
+def _state_reasons(
+    transition_minutes_guardrail: int,
+    rv_ratio_contraction_threshold: float,
+    rv_ratio_expansion_threshold: float,
+) -> Dict[int, str]:
+    """Reason text per outcome (except the grey zone) for one set of thresholds."""
+    rv_transition_trigger = rv_ratio_contraction_threshold + 0.2
+    rv_expansion_trigger = rv_ratio_expansion_threshold + 0.2
+    return {
+        _CONTRACTION: f"RV_ratio < {rv_ratio_contraction_threshold} and IV < 90% VWAP (Low Volatility)",
+        _GUARDRAIL: f"TRANSITION blocked by guardrail - less than {transition_minutes_guardrail} minutes from open",
+        _TRANSITION: f"RV_ratio > {rv_transition_trigger:.2f} (Buffered), Accelerating, IV < 90% VWAP",
+        _EXPANSION: f"RV_ratio > {rv_expansion_trigger:.2f} (Buffered) and IV > 110% VWAP (Repriced)",
+        _DEFAULT: "Default state - conditions not met for Transition or Expansion",
+    }
 
 
 def determine_market_state(
@@ -204,6 +293,7 @@ def determine_market_state(
     rv_ratio_contraction_threshold: float = 0.7,
     rv_ratio_expansion_threshold: float = 1.3,
     min_rv_ratio_acceleration: float = 0.05,
+    minutes_since_open: Optional[float] = None,
 ) -> Tuple[str, Dict]:
     """
     Determine market state: CONTRACTION, TRANSITION, or EXPANSION
@@ -217,7 +307,16 @@ def determine_market_state(
        - Expansion requires RV_ratio > threshold + 0.2
     
     Guardrail: TRANSITION state is not allowed before X minutes from market open
-    (default: 30 minutes)
+    (default: 30 minutes). Callers that already know the minutes since open can
+    pass minutes_since_open instead of market_open_time/current_time.
+    
+    The conditions are packed into a 5-bit index into _STATE_TABLE, which
+    applies the rules in priority order:
+    1. CONTRACTION (NO TRADE): RV_ratio < threshold AND IV < 0.90 * VWAP
+    2. TRANSITION (ONLY VALID ENTRY ZONE): RV_ratio > (threshold + 0.2) AND
+       Accelerating AND IV < 0.90 * VWAP; forced to CONTRACTION within the guardrail
+    3. EXPANSION (DO NOT ENTER FRESH): RV_ratio > (threshold + 0.2) AND IV > 1.10 * VWAP
+    4. GREY ZONE: retain the previous state if it was valid, otherwise UNKNOWN
     
     Returns:
         (state_name, state_info)
@@ -232,11 +331,10 @@ def determine_market_state(
         })
     
     # Check if we're within the guardrail period (before X minutes from open)
-    within_guardrail = False
-    if market_open_time is not None and current_time is not None:
+    if minutes_since_open is None and market_open_time is not None and current_time is not None:
         time_since_open = current_time - market_open_time
         minutes_since_open = time_since_open.total_seconds() / 60
-        within_guardrail = minutes_since_open < transition_minutes_guardrail
+    within_guardrail = minutes_since_open is not None and minutes_since_open < transition_minutes_guardrail
     
     # Define buffered thresholds for state changes
     iv_expansion_trigger = iv_vwap * 1.10
@@ -245,84 +343,38 @@ def determine_market_state(
     rv_transition_trigger = rv_ratio_contraction_threshold + 0.2
     rv_expansion_trigger = rv_ratio_expansion_threshold + 0.2
 
-    # 1. CONTRACTION (NO TRADE)
-    # RV_ratio < threshold AND IV < 0.90 * VWAP (Strict low vol)
-    if rv_ratio < rv_ratio_contraction_threshold and iv_atm < iv_non_expansion_trigger:
-        return ("CONTRACTION", {
-            "reason": f"RV_ratio < {rv_ratio_contraction_threshold} and IV < 90% VWAP (Low Volatility)",
-            "action": "NO TRADE - No naked buying",
-            "stabilization": "Strict condition met",
-            "rv_ratio": rv_ratio,
-            "iv_atm": iv_atm,
-            "iv_vwap": iv_vwap
-        })
-
-    # 2. TRANSITION (ONLY VALID ENTRY ZONE)
-    # RV_ratio > (threshold + 0.2) AND Accelerating AND IV < 0.90 * VWAP
-    is_accelerating = False
-    if rv_ratio_delta is not None:
-        is_accelerating = rv_ratio_delta >= min_rv_ratio_acceleration
-
-    # Note: We removed the upper bound check (<= expansion_threshold) here because
-    # if RV is very high but IV is still LOW, it is a valid Transition (buying opportunity).
-    if rv_ratio > rv_transition_trigger and is_accelerating and iv_atm < iv_non_expansion_trigger:
-        if within_guardrail:
-            # Guardrail: Force CONTRACTION if within guardrail period
-            return ("CONTRACTION", {
-                "reason": f"TRANSITION blocked by guardrail - less than {transition_minutes_guardrail} minutes from open",
-                "action": "NO TRADE - Wait for guardrail period to pass",
-                "stabilization": "Guardrail active",
-                "rv_ratio": rv_ratio,
-                "iv_atm": iv_atm,
-                "iv_vwap": iv_vwap,
-                "guardrail_active": True,
-                "minutes_since_open": (current_time - market_open_time).total_seconds() / 60 if market_open_time and current_time else None
-            })
-        else:
-            return ("TRANSITION", {
-                "reason": f"RV_ratio > {rv_transition_trigger:.2f} (Buffered), Accelerating, IV < 90% VWAP",
-                "action": "VALID ENTRY ZONE - Buy options here",
-                "stabilization": "Strict condition met",
-                "rv_ratio": rv_ratio,
-                "rv_ratio_delta": rv_ratio_delta,
-                "iv_atm": iv_atm,
-                "iv_vwap": iv_vwap,
-                "is_accelerating": True
-            })
-    
-    # 3. EXPANSION (DO NOT ENTER FRESH)
-    # RV_ratio > (threshold + 0.2) AND IV > 1.10 * VWAP
-    if rv_ratio > rv_expansion_trigger and iv_atm > iv_expansion_trigger:
-        return ("EXPANSION", {
-            "reason": f"RV_ratio > {rv_expansion_trigger:.2f} (Buffered) and IV > 110% VWAP (Repriced)",
-            "action": "DO NOT ENTER FRESH - Manage existing trades only",
-            "stabilization": "Strict condition met",
-            "rv_ratio": rv_ratio,
-            "iv_atm": iv_atm,
-            "iv_vwap": iv_vwap
-        })
-    
-    # 4. GREY ZONE / FALLBACK
-    # If we are here, current metrics do not strictly satisfy any new state condition.
-    # Retain the previous state if it was valid.
-    if prev_state in ["CONTRACTION", "TRANSITION", "EXPANSION"]:
-        return (prev_state, {
-            "reason": f"Grey Zone - Retaining previous state ({prev_state})",
-            "action": "HOLD STATE - Metrics in buffer zone",
-            "stabilization": "Grey Zone Active",
-            "rv_ratio": rv_ratio,
-            "iv_atm": iv_atm,
-            "iv_vwap": iv_vwap
-        })
+    is_accelerating = rv_ratio_delta is not None and rv_ratio_delta >= min_rv_ratio_acceleration
+    iv_low = iv_atm < iv_non_expansion_trigger
+
+    # Note: there is no upper bound on RV for TRANSITION: if RV is very high
+    # but IV is still LOW, it is a valid Transition (buying opportunity).
+    index = (
+        (rv_ratio < rv_ratio_contraction_threshold and iv_low)
+        | (rv_ratio > rv_transition_trigger and is_accelerating and iv_low) << 1
+        | (rv_ratio > rv_expansion_trigger and iv_atm > iv_expansion_trigger) << 2
+        | within_guardrail << 3
+        | (prev_state in _STABLE_STATES) << 4
+    )
+    outcome = _STATE_TABLE[index]
 
-    # Default fallback
-    return ("UNKNOWN", {
-        "reason": "Default state - conditions not met for Transition or Expansion",
-        "action": "NO TRADE",
+    state_info = {
+        "reason": _GREY_ZONE_REASONS[prev_state] if outcome == _GREY_ZONE else _state_reasons(
+            transition_minutes_guardrail, rv_ratio_contraction_threshold, rv_ratio_expansion_threshold,
+        )[outcome],
+        **_STATE_INFO_TEMPLATES[outcome],
         "rv_ratio": rv_ratio,
         "iv_atm": iv_atm,
-        "iv_vwap": iv_vwap
-    })
+        "iv_vwap": iv_vwap,
+    }
+    if outcome == _GUARDRAIL:
+        state_info["guardrail_active"] = True
+        state_info["minutes_since_open"] = minutes_since_open
+    elif outcome == _TRANSITION:
+        state_info["rv_ratio_delta"] = rv_ratio_delta
+        state_info["is_accelerating"] = True
+
+    state = prev_state if outcome == _GREY_ZONE else _STATE_NAMES[outcome]
+    return (state, state_info)
 
 
 def calculate_volatility_metrics(
@@ -335,7 +387,9 @@ def calculate_volatility_metrics(
     options: List[Dict],
     atm_strike: float,
     underlying_price: float,
-    full_day_price_history: List[Dict],
+    full_day_timestamps: Optional[np.ndarray],
+    full_day_prices: Optional[np.ndarray],
+    option_arrays: Optional[Dict[str, np.ndarray]] = None,
     rv_ratio_prev: Optional[float] = None,
     prev_volatility_metrics: Optional[Dict] = None,
     rv_ratio_contraction_threshold: float = 0.8,
@@ -345,12 +399,27 @@ def calculate_volatility_metrics(
     """
     Calculate all volatility metrics and determine market state
     
+    option_arrays is the column view of `options` (utils.get_option_arrays);
+    it is built here when not supplied.
+    
     Returns a dictionary with all calculated values and market state
     """
+    # Epoch seconds for the time arithmetic below. History timestamps are UTC
+    # epochs, so a naive current_time is treated as UTC.
+    if current_time.tzinfo is None:
+        current_epoch = current_time.replace(tzinfo=timezone.utc).timestamp()
+    else:
+        current_epoch = current_time.timestamp()
+    if market_open_time.tzinfo is None:
+        open_epoch = market_open_time.replace(tzinfo=timezone.utc).timestamp()
+    else:
+        open_epoch = market_open_time.timestamp()
+    minutes_since_open = (current_epoch - open_epoch) / 60
+
     # Calculate metrics
     rv_current = calculate_rv_current(price_series_15min)
-    rv_open_norm = calculate_rv_open_normalized(current_price, open_price, market_open_time, current_time)
-    rv_median = calculate_rv_median(full_day_price_history, current_time)
+    rv_open_norm = calculate_rv_open_normalized_epoch(current_price, open_price, open_epoch, current_epoch)
+    rv_median = calculate_rv_median(full_day_timestamps, full_day_prices, current_time, current_epoch)
     
     rv_ratio = None
     rv_ratio_delta = None
@@ -364,8 +433,7 @@ def calculate_volatility_metrics(
         if rv_ratio_prev is not None and rv_ratio_prev > 0:
             rv_ratio_delta = (rv_ratio / rv_ratio_prev) - 1
         
-    iv_atm = get_iv_cluster(options, atm_strike)
-    iv_vwap = calculate_iv_vwap(options, atm_strike)
+    iv_atm, iv_vwap = calculate_iv_metrics(options, atm_strike, option_arrays)
     
     # Extract previous state info for stabilization
     prev_confirmed_state = "UNKNOWN"
@@ -390,7 +458,8 @@ def calculate_volatility_metrics(
         prev_state=prev_confirmed_state,
         rv_ratio_contraction_threshold=rv_ratio_contraction_threshold,
         rv_ratio_expansion_threshold=rv_ratio_expansion_threshold,
-        min_rv_ratio_acceleration=min_rv_ratio_acceleration
+        min_rv_ratio_acceleration=min_rv_ratio_acceleration,
+        minutes_since_open=minutes_since_open
     )
     
     # Apply Debounce / Hold Rule (1-minute hold)
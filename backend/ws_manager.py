@@ -1,66 +1,199 @@
+import asyncio
+import logging
+import os
+import time
 from fastapi import WebSocket, WebSocketDisconnect
-from typing import List, Dict
-from datetime import datetime, timezone
+from typing import Dict, Optional
+
+import orjson
+
+try:
+    import redis.asyncio as aioredis
+except ImportError:
+    aioredis = None
+
+logger = logging.getLogger(__name__)
+
+# Optional Redis pub/sub fan-out: when set, the polling worker publishes every
+# tick and each worker relays it to its own WebSocket clients
+REDIS_URL = os.getenv("REDIS_URL")
+TICKS_CHANNEL = "pipeline.ticks"
+
+# Frames buffered per client before the oldest queued tick is dropped
+SEND_QUEUE_SIZE = 32
+# Seconds a single frame may take to send before the client is dropped
+SEND_TIMEOUT = 2.0
+
+
+def dumps(data) -> str:
+    """JSON text for a WebSocket frame"""
+    return orjson.dumps(data, option=orjson.OPT_NON_STR_KEYS).decode()
+
 
 # WebSocket connection manager
 class ConnectionManager:
     def __init__(self):
-        self.active_connections: List[WebSocket] = []
-        self.connection_metadata: Dict[WebSocket, Dict] = {}
+        # Connected clients and their metadata (ping times, send queue, sender
+        # task), in connection order
+        self.active_connections: Dict[WebSocket, Dict] = {}
+        # Last broadcast payload and its serialized form, reused for initial sends on connect
+        self._last_payload: Optional[dict] = None
+        self._last_message: Optional[str] = None
+        # Last frame received from Redis (workers without a pipeline of their own)
+        self._last_relayed: Optional[str] = None
+        self._redis = None
+        if REDIS_URL:
+            if aioredis is None:
+                logger.warning("⚠️ REDIS_URL is set but the redis package is not installed; broadcasting locally")
+            else:
+                self._redis = aioredis.from_url(REDIS_URL)
+    
+    @property
+    def redis_enabled(self) -> bool:
+        return self._redis is not None
+    
+    def has_clients(self) -> bool:
+        """True if this worker has at least one connected WebSocket client"""
+        return bool(self.active_connections)
+    
+    @property
+    def last_relayed_message(self) -> Optional[str]:
+        """Most recent frame received from Redis, for initial sends on workers that don't poll"""
+        return self._last_relayed
     
-    async def connect(self, websocket: WebSocket):
+    async def connect(self, websocket: WebSocket) -> bool:
+        """Accept and register a client. Returns False if it was rejected and closed."""
         # Check connection limit (max 10 connections)
         if len(self.active_connections) >= 10:
             await websocket.close(code=1008, reason="Too many connections")
-            return
+            return False
         
+        # No socket tuning needed here: both the default asyncio loop and uvloop
+        # set TCP_NODELAY on every accepted TCP transport, so small tick frames
+        # are not held back by Nagle's algorithm.
         await websocket.accept()
-        self.active_connections.append(websocket)
-        self.connection_metadata[websocket] = {
-            "connected_at": datetime.now(timezone.utc),
-            "last_ping": datetime.now(timezone.utc)
+        queue: asyncio.Queue = asyncio.Queue(maxsize=SEND_QUEUE_SIZE)
+        now_ns = time.monotonic_ns()
+        self.active_connections[websocket] = {
+            "connected_at_ns": now_ns,
+            "last_ping_ns": now_ns,
+            "queue": queue,
+            "sender": asyncio.create_task(self._sender(websocket, queue)),
         }
+        return True
     
     def disconnect(self, websocket: WebSocket):
-        if websocket in self.active_connections:
-            self.active_connections.remove(websocket)
-        if websocket in self.connection_metadata:
-            del self.connection_metadata[websocket]
+        meta = self.active_connections.pop(websocket, None)
+        if meta:
+            sender = meta["sender"]
+            if sender is not asyncio.current_task():
+                sender.cancel()
+    
+    async def _sender(self, websocket: WebSocket, queue: asyncio.Queue):
+        """Drain one client's queue so a slow client never holds up the others"""
+        try:
+            while True:
+                message = await queue.get()
+                await asyncio.wait_for(websocket.send_text(message), timeout=SEND_TIMEOUT)
+        except asyncio.CancelledError:
+            raise
+        except asyncio.TimeoutError:
+            logger.warning("🐢 Dropping slow WebSocket client (send took over %ss)", SEND_TIMEOUT)
+            self.disconnect(websocket)
+            try:
+                await asyncio.wait_for(websocket.close(code=1013), timeout=SEND_TIMEOUT)
+            except Exception:
+                pass
+        except Exception as e:
+            if not isinstance(e, (WebSocketDisconnect, RuntimeError, ConnectionError)):
+                error_msg = str(e).lower()
+                if "closed" not in error_msg and "disconnect" not in error_msg and "send" not in error_msg:
+                    logger.error("❌ WebSocket send error: %s", e)
+            self.disconnect(websocket)
+    
+    def send(self, websocket: WebSocket, message: str):
+        """
+        Queue a text frame for one client without blocking.
+        When the client's queue is full the oldest frame is dropped, so a
+        stalled client only ever holds the latest SEND_QUEUE_SIZE ticks.
+        """
+        meta = self.active_connections.get(websocket)
+        if meta is None:
+            return
+        queue = meta["queue"]
+        try:
+            queue.put_nowait(message)
+        except asyncio.QueueFull:
+            queue.get_nowait()
+            queue.put_nowait(message)
     
     def update_ping(self, websocket: WebSocket):
-        """Update last ping timestamp for a connection"""
-        if websocket in self.connection_metadata:
-            self.connection_metadata[websocket]["last_ping"] = datetime.now(timezone.utc)
+        """Update last ping timestamp (time.monotonic_ns()) for a connection"""
+        meta = self.active_connections.get(websocket)
+        if meta is not None:
+            meta["last_ping_ns"] = time.monotonic_ns()
     
     async def cleanup_stale_connections(self, max_age_seconds=300):
         """Remove connections that haven't pinged in specified seconds (default 5 minutes)"""
-        now = datetime.now(timezone.utc)
-        stale = []
-        for ws, meta in self.connection_metadata.items():
-            age = (now - meta["last_ping"]).total_seconds()
-            if age > max_age_seconds:
-                stale.append(ws)
+        if not self.active_connections:
+            return
+        cutoff_ns = time.monotonic_ns() - max_age_seconds * 1_000_000_000
+        stale = [ws for ws, meta in self.active_connections.items() if meta["last_ping_ns"] < cutoff_ns]
         
         for ws in stale:
-            print(f"🧹 Removing stale WebSocket connection (no ping for {max_age_seconds}s)")
-            await self.disconnect(ws)
+            logger.info("🧹 Removing stale WebSocket connection (no ping for %ss)", max_age_seconds)
+            self.disconnect(ws)
+    
+    def serialize(self, data: dict) -> str:
+        """Serialize a payload to JSON text, reusing the last result for the same payload object"""
+        if data is not self._last_payload:
+            self._last_message = dumps(data)
+            self._last_payload = data
+        return self._last_message
+    
+    def _fanout(self, message: str):
+        for connection in self.active_connections:
+            self.send(connection, message)
     
     async def broadcast(self, data: dict):
-        disconnected = []
-        for connection in self.active_connections[:]:  # Use slice copy to avoid modification during iteration
+        """
+        Serialize the payload once and queue the same text frame for every client.
+        With Redis enabled the frame is published instead, and every worker
+        (this one included) delivers it from run_redis_fanout.
+        """
+        message = self.serialize(data)
+        if self._redis is not None:
             try:
-                await connection.send_json(data)
-            except (WebSocketDisconnect, RuntimeError, ConnectionError):
-                disconnected.append(connection)
+                await self._redis.publish(TICKS_CHANNEL, message)
+                return
             except Exception as e:
-                error_msg = str(e).lower()
-                if "closed" not in error_msg and "disconnect" not in error_msg and "send" not in error_msg:
-                    print(f"❌ WebSocket send error: {e}")
-                disconnected.append(connection)
-        
-        # Remove disconnected connections
-        for conn in disconnected:
-            self.disconnect(conn)
+                logger.warning("⚠️ Redis publish failed, broadcasting locally: %s", e)
+        self._fanout(message)
+    
+    async def run_redis_fanout(self):
+        """Relay frames published on TICKS_CHANNEL to this worker's clients. Runs in every worker."""
+        logger.info("📡 Relaying WebSocket broadcasts from Redis channel '%s'", TICKS_CHANNEL)
+        while True:
+            pubsub = self._redis.pubsub()
+            try:
+                await pubsub.subscribe(TICKS_CHANNEL)
+                async for item in pubsub.listen():
+                    if item["type"] != "message":
+                        continue
+                    message = item["data"].decode()
+                    self._last_relayed = message
+                    self._fanout(message)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning("⚠️ Redis subscription error: %s, retrying in 5s", e)
+                await asyncio.sleep(5)
+            finally:
+                await pubsub.aclose()
+    
+    async def close(self):
+        if self._redis is not None:
+            await self._redis.aclose()
 
 
 # Create a single, global instance of the manager